@@ -0,0 +1,4 @@
+"""Entry point of the ASGI serving mode, run with ``uvicorn asgi:app``."""
+from flaskr.asgi import create_asgi_app
+
+app = create_asgi_app()
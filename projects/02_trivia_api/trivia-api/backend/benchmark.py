@@ -0,0 +1,425 @@
+"""Load test of the Trivia API with concurrent simulated players.
+
+Generates a synthetic question bank, serves the API from a local server and drives the questions, search, category
+and quiz endpoints with concurrent players, then reports the latency percentiles, the throughput and the number of
+database queries of each endpoint as a JSON artifact. The WSGI and ASGI serving modes can be compared in a single run.
+
+Usage:
+    python benchmark.py --questions 10000 --players 50 --duration 30 --output benchmark.json
+    python benchmark.py --players 500 --server wsgi asgi
+
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from flaskr import create_app, QUESTIONS_PER_PAGE
+from models import db, Question, Category
+
+WORDS = [
+    "river", "planet", "painter", "empire", "element", "mountain", "league",
+    "novel", "ocean", "composer", "volcano", "dynasty", "molecule", "island",
+]
+PERCENTILES = (50, 95, 99)
+QUIZ_LENGTH = 5
+ENDPOINT_HEADER = "X-Benchmark-Endpoint"
+
+
+def generate_question_bank(question_count, category_count, seed):
+    """Replace the questions and categories of the database with synthetic ones.
+
+    Args:
+        question_count (int) : The number of questions to generate.
+        category_count (int) : The number of categories to generate.
+        seed (int) : The seed of the random generator, so every run gets the same bank.
+
+    Returns:
+        The list of the generated category IDs.
+
+    """
+    generator = random.Random(seed)
+
+    db.session.query(Question).delete()
+    db.session.query(Category).delete()
+    categories = [Category(f"Category {i + 1}") for i in range(category_count)]
+    db.session.add_all(categories)
+    db.session.flush()
+    category_ids = [c.id for c in categories]
+
+    db.session.bulk_insert_mappings(
+        Question,
+        [
+            {
+                "question": f"Question {i} about the "
+                f"{generator.choice(WORDS)} and the {generator.choice(WORDS)}?",
+                "answer": f"Answer {i}",
+                "category": generator.choice(category_ids),
+                "difficulty": generator.randint(1, 5),
+            }
+            for i in range(question_count)
+        ],
+    )
+    db.session.commit()
+    Category.reconcile_question_counts()
+
+    return category_ids
+
+
+def count_queries(engine, counts):
+    """Count the queries executed by the engine for each benchmarked endpoint.
+
+    The players name the endpoint of each request with the ``X-Benchmark-Endpoint`` header, since the list and the
+    search of questions share the same view.
+
+    Args:
+        engine (~sqlalchemy.engine.Engine) : The engine of the app.
+        counts (dict) : Incremented by the endpoint name of the request executing each query.
+
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(*args):
+        if has_request_context():
+            counts[request.headers.get(ENDPOINT_HEADER, request.endpoint)] += 1
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler of the local server which doesn't log every request."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Player(threading.Thread):
+    """A simulated player browsing the questions and playing quizzes until the deadline.
+
+    Attributes:
+        base_url (str) : The URL of the API.
+        category_ids (list) : The IDs of the categories to browse.
+        deadline (float) : The ``time.monotonic()`` to stop at.
+        samples (list) : Filled with ``(endpoint, seconds, status)`` tuples of every request.
+
+    """
+
+    def __init__(self, base_url, category_ids, deadline, seed):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.category_ids = category_ids
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.samples = []
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            self.request("get_questions", "GET", "/api/questions")
+            self.request(
+                "search_questions",
+                "GET",
+                f"/api/questions?q={self.random.choice(WORDS)}",
+            )
+
+            category_id = self.random.choice(self.category_ids)
+            self.request(
+                "get_questions_by_category",
+                "GET",
+                f"/api/categories/{category_id}/questions",
+            )
+
+            previous_questions = []
+            correct_answers = 0
+            for _ in range(QUIZ_LENGTH):
+                if time.monotonic() >= self.deadline:
+                    break
+                body = self.request(
+                    "play_game",
+                    "POST",
+                    "/api/quizzes",
+                    {
+                        "previous_questions": previous_questions,
+                        "quiz_category": {"id": category_id},
+                        "adaptive": True,
+                        "correct_answers": correct_answers,
+                    },
+                )
+                if body is None:
+                    break
+                previous_questions.append(body["question"]["id"])
+                correct_answers += self.random.random() < 0.5
+
+    def request(self, endpoint, method, path, body=None):
+        """Send a request and record its latency.
+
+        Returns:
+            The decoded JSON body or ``None`` if the request failed.
+
+        """
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={
+                "Content-Type": "application/json",
+                ENDPOINT_HEADER: endpoint,
+            },
+        )
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as response:
+                content = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            content = None
+            status = e.code
+        except OSError:
+            content = None
+            status = None
+        self.samples.append((endpoint, time.perf_counter() - start, status))
+
+        return json.loads(content) if content else None
+
+
+def percentile(sorted_values, p):
+    """Get the ``p`` percentile of sorted values using the nearest rank."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, query_counts, elapsed):
+    """Aggregate the samples of every player by endpoint.
+
+    Args:
+        samples (list) : The ``(endpoint, seconds, status)`` tuples of every request.
+        query_counts (dict) : The number of queries executed by endpoint.
+        elapsed (float) : The duration of the run in seconds.
+
+    Returns:
+        A dictionary of statistics by endpoint, latencies are in milliseconds.
+
+    """
+    by_endpoint = defaultdict(list)
+    for endpoint, seconds, status in samples:
+        by_endpoint[endpoint].append((seconds, status))
+
+    result = {}
+    for endpoint, values in sorted(by_endpoint.items()):
+        latencies = sorted(seconds * 1000 for seconds, _ in values)
+        errors = sum(1 for _, status in values if status is None or status >= 500)
+        result[endpoint] = {
+            "requests": len(values),
+            "errors": errors,
+            "throughput": round(len(values) / elapsed, 2),
+            "latency_ms": dict(
+                {f"p{p}": round(percentile(latencies, p), 3) for p in PERCENTILES},
+                mean=round(sum(latencies) / len(latencies), 3),
+                max=round(latencies[-1], 3),
+            ),
+            "queries": query_counts.get(endpoint, 0),
+            "queries_per_request": round(
+                query_counts.get(endpoint, 0) / len(values), 2
+            ),
+        }
+    return result
+
+
+@contextmanager
+def serve_wsgi(app, host, port):
+    """Serve the app from a threaded WSGI server, as ``flask run`` does.
+
+    Yields:
+        The base URL of the server.
+
+    """
+    server = make_server(
+        host, port, app, threaded=True, request_handler=QuietRequestHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://{host}:{server.server_port}"
+    finally:
+        server.shutdown()
+
+
+@contextmanager
+def serve_asgi(app, host, port):
+    """Serve the app through the ASGI adapter from uvicorn, as ``uvicorn asgi:app`` does.
+
+    Yields:
+        The base URL of the server.
+
+    """
+    import uvicorn
+    from asgiref.wsgi import WsgiToAsgi
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((host, port))
+    config = uvicorn.Config(
+        WsgiToAsgi(app), log_level="warning", access_log=False
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(
+        target=server.run, kwargs={"sockets": [sock]}, daemon=True
+    )
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://{host}:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join()
+        sock.close()
+
+
+SERVERS = {"wsgi": serve_wsgi, "asgi": serve_asgi}
+
+
+def run_players(base_url, category_ids, args):
+    """Run the concurrent players against a server until the end of the run.
+
+    Returns:
+        A tuple with the samples of every player and the duration of the run in seconds.
+
+    """
+    start = time.monotonic()
+    players = [
+        Player(base_url, category_ids, start + args.duration, args.seed + i)
+        for i in range(args.players)
+    ]
+    for player in players:
+        player.start()
+    for player in players:
+        player.join()
+    elapsed = time.monotonic() - start
+
+    return [sample for player in players for sample in player.samples], elapsed
+
+
+def run(args):
+    """Run the load test described by the command line arguments against each server.
+
+    Returns:
+        The report as a dictionary.
+
+    """
+    database_uri = args.database_uri
+    if database_uri is None:
+        database_file = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        database_uri = f"sqlite:///{database_file}"
+
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": database_uri,
+            "APIDOCS": "disabled",
+            # Every player shares the same IP address
+            "RATE_LIMIT_ENABLED": False,
+        }
+    )
+    with app.app_context():
+        category_ids = generate_question_bank(
+            args.questions, args.categories, args.seed
+        )
+        query_counts = defaultdict(int)
+        count_queries(db.engine, query_counts)
+
+    servers = {}
+    for name in args.server:
+        query_counts.clear()
+        with SERVERS[name](app, args.host, args.port) as base_url:
+            samples, elapsed = run_players(base_url, category_ids, args)
+
+        servers[name] = {
+            "elapsed": round(elapsed, 3),
+            "requests": len(samples),
+            "throughput": round(len(samples) / elapsed, 2),
+            "endpoints": summarize(samples, query_counts, elapsed),
+        }
+
+    return {
+        "config": {
+            "questions": args.questions,
+            "categories": args.categories,
+            "players": args.players,
+            "duration": args.duration,
+            "questions_per_page": QUESTIONS_PER_PAGE,
+            "database": make_url(database_uri).get_backend_name(),
+        },
+        "servers": servers,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--questions", type=int, default=10000,
+        help="The number of questions of the synthetic bank.",
+    )
+    parser.add_argument(
+        "--categories", type=int, default=6,
+        help="The number of categories of the synthetic bank.",
+    )
+    parser.add_argument(
+        "--players", type=int, default=20,
+        help="The number of concurrent players.",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0,
+        help="The number of seconds the players keep playing.",
+    )
+    parser.add_argument(
+        "--database-uri",
+        help="The database to fill with the synthetic bank, all of its questions are replaced. "
+        "Defaults to a temporary SQLite file.",
+    )
+    parser.add_argument(
+        "--server", nargs="+", choices=sorted(SERVERS), default=["wsgi"],
+        help="The serving modes to benchmark one after the other, asgi requires uvicorn.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, default=0,
+        help="The port of the local server, a free one by default.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default="benchmark.json",
+        help="The file to write the JSON report to.",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, server in report["servers"].items():
+        print(f"{name}: {server['throughput']:.2f} req/s")
+        for endpoint, stats in server["endpoints"].items():
+            latency = stats["latency_ms"]
+            print(
+                f"  {endpoint:28} {stats['requests']:7} requests "
+                f"{stats['throughput']:9.2f} req/s "
+                f"p50 {latency['p50']:8.2f} ms p95 {latency['p95']:8.2f} ms "
+                f"p99 {latency['p99']:8.2f} ms "
+                f"{stats['queries_per_request']:5.2f} queries/request"
+            )
+    print(f"Report written to {args.output}")
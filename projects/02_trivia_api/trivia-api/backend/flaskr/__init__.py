@@ -1,10 +1,36 @@
-from flask import Flask, request, abort, jsonify
+import atexit
+import json
+import os
+
+import click
+from flask import (
+    Flask,
+    Response,
+    request,
+    abort,
+    jsonify,
+    stream_with_context,
+)
 from flask_cors import CORS
+from flask_migrate import Migrate
 from sqlalchemy import exc
 from werkzeug.exceptions import HTTPException, default_exceptions, _aborter
-from flasgger import Swagger
-
-from models import setup_db, Question, Category
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from models import setup_db, db, Question, Category, Score, DATABASE_PATH
+from .apidocs import setup_apidocs, APIDOCS_FILE, APIDOCS_RUNTIME
+from .leaderboard import Leaderboard
+from .metrics import Counter, Metrics
+from .quiz import DifficultyIndex, MAX_DIFFICULTY, MIN_DIFFICULTY
+from .ratelimit import RateLimiter, create_backend
+from .similarity import (
+    SIMILARITY_THRESHOLD,
+    cluster,
+    minhash,
+    normalize,
+    text_hash,
+)
+from .streaming import stream_json_array, to_json_line
 
 
 class NoContent(HTTPException):
@@ -27,6 +53,29 @@ default_exceptions[204] = NoContent
 _aborter.mapping[204] = NoContent
 
 QUESTIONS_PER_PAGE = 10
+QUESTIONS_PER_BATCH = 500
+MAX_BULK_OPERATIONS = 1000
+MAX_QUIZ_BUNDLE = 20
+LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+SEARCH_COST = 5
+RATE_LIMITS = {
+    "get_questions": (20, 40),
+    "get_questions_by_category": (20, 40),
+    "add_question": (2, 10),
+    "add_questions_batch": (0.1, 2),
+    "apply_questions_bulk": (0.1, 2),
+    "play_game": (10, 20),
+    "check_quiz_answers": (10, 20),
+    "add_score": (2, 10),
+}
+
+
+def request_cost():
+    """The number of rate limit tokens of the current request, a search costs more than listing questions."""
+    if request.endpoint == "get_questions" and "q" in request.args:
+        return SEARCH_COST
+    return 1
 
 
 def create_app(test_config=None):
@@ -40,9 +89,134 @@ def create_app(test_config=None):
 
     """
     app = Flask(__name__)
-    setup_db(app)
+    app.config.from_mapping(
+        SQLALCHEMY_DATABASE_URI=DATABASE_PATH,
+        APIDOCS=os.getenv("APIDOCS", APIDOCS_RUNTIME),
+        APIDOCS_FILE=APIDOCS_FILE,
+        RATE_LIMIT_ENABLED=True,
+        RATE_LIMIT_STORAGE_URL=os.getenv("RATE_LIMIT_STORAGE_URL"),
+        RATE_LIMITS=RATE_LIMITS,
+        RATE_LIMIT_API_KEYS=frozenset(
+            key for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key
+        ),
+        TRUSTED_PROXIES=int(os.getenv("TRUSTED_PROXIES", 0)),
+        LEADERBOARD_BATCH_SIZE=int(os.getenv("LEADERBOARD_BATCH_SIZE", 100)),
+        LEADERBOARD_CHECKPOINT_INTERVAL=float(
+            os.getenv("LEADERBOARD_CHECKPOINT_INTERVAL", 5)
+        ),
+        LEADERBOARD_RELOAD_INTERVAL=float(
+            os.getenv("LEADERBOARD_RELOAD_INTERVAL", 30)
+        ),
+        QUIZ_INDEX_RELOAD_INTERVAL=float(
+            os.getenv("QUIZ_INDEX_RELOAD_INTERVAL", 30)
+        ),
+    )
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+    if app.config["TRUSTED_PROXIES"]:
+        # Only the X-Forwarded-* values set by the trusted proxies are used, e.g. for the IP of rate limited clients
+        proxies = app.config["TRUSTED_PROXIES"]
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies
+        )
+    # The tests don't run the checkpoints and reloads in the background, they would race with their transactions
+    app.config.setdefault("LEADERBOARD_SCHEDULED_CHECKPOINTS", not app.testing)
+    app.config.setdefault("QUIZ_INDEX_SCHEDULED_RELOADS", not app.testing)
+    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        app.config.setdefault(
+            "SQLALCHEMY_ENGINE_OPTIONS",
+            {
+                "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+                "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+                "pool_pre_ping": True,
+            },
+        )
+
+    setup_db(app, app.config["SQLALCHEMY_DATABASE_URI"])
+    migrate = Migrate(app, db)
     cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
-    swagger = Swagger(app)
+    swagger = setup_apidocs(app)
+    difficulty_index = DifficultyIndex(
+        lambda: db.session.query(
+            Question.id, Question.category, Question.difficulty
+        ).all(),
+        reload_interval=app.config["QUIZ_INDEX_RELOAD_INTERVAL"],
+    )
+    app.extensions["difficulty_index"] = difficulty_index
+    leaderboard = Leaderboard(
+        Score.best_scores,
+        Score.insert_all,
+        batch_size=app.config["LEADERBOARD_BATCH_SIZE"],
+        checkpoint_interval=app.config["LEADERBOARD_CHECKPOINT_INTERVAL"],
+        reload_interval=app.config["LEADERBOARD_RELOAD_INTERVAL"],
+    )
+    app.extensions["leaderboard"] = leaderboard
+
+    def checkpoint_scores():
+        """Write the pending scores of the leaderboard to the database."""
+        try:
+            leaderboard.checkpoint()
+        except exc.SQLAlchemyError:
+            # The scores are kept pending for the next checkpoint
+            db.session.rollback()
+
+    def checkpoint_scores_outside_requests():
+        """Write the pending scores of the leaderboard within a new application context."""
+        with app.app_context():
+            checkpoint_scores()
+
+    def reload_scores_outside_requests():
+        """Reload the leaderboard from the database within a new application context."""
+        with app.app_context():
+            try:
+                leaderboard.reload()
+            except exc.SQLAlchemyError:
+                # The current leaderboards are kept until the next reload
+                db.session.rollback()
+
+    if app.config["LEADERBOARD_SCHEDULED_CHECKPOINTS"]:
+        leaderboard.schedule(
+            checkpoint_scores_outside_requests, reload_scores_outside_requests
+        )
+        # Flush the scores still pending when the worker process shuts down
+        atexit.register(checkpoint_scores_outside_requests)
+        atexit.register(leaderboard.stop)
+
+    def reload_difficulty_index_outside_requests():
+        """Rebuild the difficulty index from the database within a new application context."""
+        with app.app_context():
+            try:
+                difficulty_index.reload()
+            except exc.SQLAlchemyError:
+                # The current index is kept until the next reload
+                db.session.rollback()
+
+    if app.config["QUIZ_INDEX_SCHEDULED_RELOADS"]:
+        difficulty_index.schedule(reload_difficulty_index_outside_requests)
+        atexit.register(difficulty_index.stop)
+    # Set up before the rate limiter, so the limited requests are measured
+    metrics = Metrics()
+    metrics.init_app(app, db.get_engine(app))
+    rate_limiter = None
+    if app.config["RATE_LIMIT_ENABLED"]:
+        rate_limiter = RateLimiter(
+            app, create_backend(app.config["RATE_LIMIT_STORAGE_URL"])
+        )
+        for endpoint, (rate, burst) in app.config["RATE_LIMITS"].items():
+            rate_limiter.limit(endpoint, rate, burst, cost=request_cost)
+
+        def collect_rate_limits():
+            counter = Counter(
+                "trivia_rate_limit_requests_total",
+                "The number of requests to rate limited endpoints.",
+                ("endpoint", "decision"),
+            )
+            for endpoint, counts in rate_limiter.counters.items():
+                for decision, count in counts.items():
+                    counter.inc((endpoint, decision), count)
+            return counter.render()
+
+        metrics.collectors.append(collect_rate_limits)
 
     @app.after_request
     def after_request(response):
@@ -82,6 +256,12 @@ def create_app(test_config=None):
             required: false
             description: The page of the result that comes in batches of 10 questions.
             default: 1
+          - name: stream
+            in: query
+            type: boolean
+            required: false
+            description: Used with ``q``, stream every matching question instead of a single page.
+            default: false
         definitions:
           Category:
             type: object
@@ -92,6 +272,9 @@ def create_app(test_config=None):
               type:
                 type: string
                 example: History
+              question_count:
+                type: integer
+                example: 4
           Question:
             type: object
             properties:
@@ -223,10 +406,28 @@ def create_app(test_config=None):
         """
         page = request.args.get("page", 1, type=int)
         start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
 
-        selection = Question.query.filter_by(category=str(category_id)).all()
-        result_questions = [q.format() for q in selection][start:end]
+        categories = query_all_categories()
+        total_questions = next(
+            (
+                c["question_count"]
+                for c in categories
+                if c["id"] == category_id
+            ),
+            0,
+        )
+
+        if page < 1 or start >= total_questions:
+            return abort(404)
+
+        selection = (
+            Question.query.filter(Question.category == category_id)
+            .order_by(Question.id)
+            .offset(start)
+            .limit(QUESTIONS_PER_PAGE)
+            .all()
+        )
+        result_questions = [q.format() for q in selection]
 
         if not len(result_questions):
             return abort(404)
@@ -234,9 +435,9 @@ def create_app(test_config=None):
         return jsonify(
             {
                 "questions": result_questions,
-                "total_questions": len(selection),
+                "total_questions": total_questions,
                 "current_category": category_id,
-                "categories": query_all_categories(),
+                "categories": categories,
             }
         )
 
@@ -262,33 +463,71 @@ def create_app(test_config=None):
         if not query_term:
             abort(400)
 
-        selection = (
-            Question.query.filter(
-                Question.question.ilike(f"%{query_term}%")
-            ).all()
-            if query_term
-            else []
-        )
+        selection = Question.query.filter(
+            Question.question.ilike(f"%{query_term}%")
+        ).order_by(Question.id)
+
+        if request.args.get("stream", "false").lower() in ("true", "1"):
+            return stream_questions(selection)
 
-        if not len(selection):
+        total_questions = selection.count()
+        metrics.search_hits.observe(total_questions)
+        if not total_questions:
             return jsonify(
                 {"questions": [], "total_questions": 0, "current_category": 0}
             )
 
-        result_questions = [q.format() for q in selection]
-
         page = request.args.get("page", 1, type=int)
-        start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
+        start = max(page - 1, 0) * QUESTIONS_PER_PAGE
+        result_questions = [
+            q.format()
+            for q in selection.offset(start).limit(QUESTIONS_PER_PAGE)
+        ]
 
         return jsonify(
             {
-                "questions": result_questions[start:end],
-                "total_questions": len(selection),
+                "questions": result_questions,
+                "total_questions": total_questions,
                 "current_category": 0,
             }
         )
 
+    def stream_questions(selection):
+        """Stream every question of a query as a JSON response.
+
+        The questions are read through a server-side cursor and serialized one at a time, so the memory used doesn't\
+        grow with the number of questions. The total of questions is written after the list.
+
+        Args:
+            selection (~flask_sqlalchemy.BaseQuery) : The query of the questions.
+
+        Returns:
+            A streamed response of a dictionary containing the list of questions, the current category with value of\
+            0 and the total of questions.
+
+        """
+        questions = (
+            q.format()
+            for q in selection.execution_options(
+                stream_results=True
+            ).yield_per(QUESTIONS_PER_BATCH)
+        )
+        return Response(
+            stream_with_context(
+                stream_json_array(
+                    "questions",
+                    questions,
+                    total_questions=count_search_hits,
+                    current_category=0,
+                )
+            ),
+            mimetype="application/json",
+        )
+
+    def count_search_hits(count):
+        metrics.search_hits.observe(count)
+        return count
+
     @app.route("/api/categories")
     def get_categories():
         """Get a list of categories.
@@ -304,7 +543,8 @@ def create_app(test_config=None):
               type: array
               items:
                 $ref: '#/definitions/Category'
-              example: [{"id":1,"type":"Science"},{"id":2,"type":"Art"},{"id":3,"type":"Geography"}]
+              example: [{"id":1,"question_count":3,"type":"Science"},{"id":2,"question_count":4,"type":"Art"},\
+              {"id":3,"question_count":3,"type":"Geography"}]
 
         """
         return jsonify(query_all_categories())
@@ -348,6 +588,7 @@ def create_app(test_config=None):
 
         try:
             question.delete()
+            difficulty_index.remove(question)
             return jsonify(None), 204
         except exc.SQLAlchemyError:
             return abort(500)
@@ -381,7 +622,7 @@ def create_app(test_config=None):
                   example: 4
                 difficulty:
                   type: integer
-                  description: The degree of difficulty, in a range from 1 to 5.
+                  description: The degree of difficulty, an integer from 1 to 5.
                   required: true
                   example: 2
         consumes:
@@ -391,39 +632,467 @@ def create_app(test_config=None):
         responses:
           500:
             description: If something goes wrong within our end.
+          409:
+            description: If the same question, ignoring case, accents and punctuation, already exists.
           400:
-            description: If one of the required parameters were missing.
+            description: If one of the required parameters were missing or invalid, or the category doesn't exist.
           201:
             description: The new created question.
             schema:
               $ref: '#/definitions/Question'
 
         """
-        body = request.get_json()
-        if body is None:
+        attributes = parse_question(request.get_json())
+        if attributes is None or not find_category_ids(
+            [attributes["category"]]
+        ):
             abort(400)
 
-        question = body.get("question", None)
-        answer = body.get("answer", None)
-        category = body.get("category", None)
-        difficulty = body.get("difficulty", None)
-
-        if not all([question, answer, category, difficulty]):
-            abort(400)
+        if Question.existing_hashes([attributes["text_hash"]]):
+            abort(409)
 
         try:
-            new_question = Question(
-                question=question,
-                answer=answer,
-                category=category,
-                difficulty=difficulty,
-            )
+            new_question = Question(**attributes)
             new_question.insert()
+            difficulty_index.add(new_question)
 
             return jsonify(new_question.format()), 201
         except exc.SQLAlchemyError:
             return abort(500)
 
+    def parse_question(body):
+        """Extract the attributes of a new question from a request body.
+
+        Args:
+            body (dict) : The decoded JSON body of the question.
+
+        Returns:
+            A dictionary with the ``question``, ``answer``, ``category`` and ``difficulty`` attributes, along with\
+            the ``text_hash`` and the MinHash ``signature`` of the question, or ``None`` if the body is missing or\
+            one of the required attributes were missing or invalid. Whether the category exists is left to the caller.
+
+        """
+        if not isinstance(body, dict):
+            return None
+
+        attributes = {
+            "question": body.get("question", None),
+            "answer": body.get("answer", None),
+            "category": body.get("category", None),
+            "difficulty": body.get("difficulty", None),
+        }
+
+        if (
+            not isinstance(attributes["question"], str)
+            or not attributes["question"].strip()
+            or not isinstance(attributes["answer"], str)
+            or not attributes["answer"].strip()
+            or not isinstance(attributes["category"], int)
+            or isinstance(attributes["category"], bool)
+            or not isinstance(attributes["difficulty"], int)
+            or isinstance(attributes["difficulty"], bool)
+            or not MIN_DIFFICULTY <= attributes["difficulty"] <= MAX_DIFFICULTY
+        ):
+            return None
+
+        attributes["text_hash"] = text_hash(attributes["question"])
+        attributes["signature"] = minhash(attributes["question"])
+        return attributes
+
+    @app.route("/api/questions:batch", methods=["POST"])
+    def add_questions_batch():
+        """Add many questions at once from a JSON Lines body.
+        Each line of the body is a question validated in the same way as adding a single question. Valid questions\
+        are inserted in batched transactions and the result of every line is streamed back as it is processed.
+        ---
+        tags:
+          - questions
+        parameters:
+          - name: body
+            in: body
+            description: One question JSON object per line.
+            schema:
+              $ref: '#/definitions/Question'
+        consumes:
+          - application/x-ndjson
+        produces:
+          - application/x-ndjson
+        definitions:
+          BatchResult:
+            type: object
+            properties:
+              line:
+                type: integer
+                example: 1
+              code:
+                type: integer
+                example: 201
+              id:
+                type: integer
+                example: 24
+              message:
+                type: string
+                example: One of the required attributes were missing or invalid.
+        responses:
+          200:
+            description: One result per line of the body, with the ID of the created question or the error code and\
+            message of the line that could not be created.
+            schema:
+              $ref: '#/definitions/BatchResult'
+
+        """
+        def generate():
+            batch = []
+            for line_number, line in enumerate(request.stream, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    attributes = parse_question(json.loads(line))
+                except ValueError:
+                    attributes = None
+
+                if attributes is None:
+                    yield to_json_line(
+                        {
+                            "line": line_number,
+                            "code": 400,
+                            "message": "One of the required attributes "
+                                       "were missing or invalid.",
+                        }
+                    )
+                    continue
+
+                batch.append((line_number, attributes))
+                if len(batch) == QUESTIONS_PER_BATCH:
+                    yield from insert_questions_batch(batch)
+                    batch = []
+
+            yield from insert_questions_batch(batch)
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+
+    def insert_questions_batch(batch):
+        """Insert a batch of questions within a single transaction.
+
+        Questions that already exist, or appear twice in the batch, are reported as conflicts. If the transaction\
+        fails, each question of the batch is retried on its own so only the faulty ones are reported as errors.
+
+        Args:
+            batch (list) : A list of tuples with the line number and the attributes of the question to be inserted.
+
+        Yields:
+            The JSON Lines result of each question of the batch.
+
+        """
+        category_ids = find_category_ids(
+            {attributes["category"] for _, attributes in batch}
+        )
+        existing_hashes = Question.existing_hashes(
+            attributes["text_hash"] for _, attributes in batch
+        )
+        unique_batch = []
+        for line_number, attributes in batch:
+            if attributes["category"] not in category_ids:
+                yield to_json_line(
+                    {
+                        "line": line_number,
+                        "code": 400,
+                        "message": "The category doesn't exist.",
+                    }
+                )
+                continue
+            if attributes["text_hash"] in existing_hashes:
+                yield to_json_line(
+                    {
+                        "line": line_number,
+                        "code": 409,
+                        "message": "The question already exists.",
+                    }
+                )
+                continue
+            existing_hashes.add(attributes["text_hash"])
+            unique_batch.append((line_number, attributes))
+        batch = unique_batch
+
+        if not batch:
+            return
+
+        questions = [Question(**attributes) for _, attributes in batch]
+
+        try:
+            Question.insert_all(questions)
+        except exc.SQLAlchemyError:
+            db.session.rollback()
+            if len(batch) > 1:
+                for line in batch:
+                    yield from insert_questions_batch([line])
+                return
+
+            yield to_json_line(
+                {
+                    "line": batch[0][0],
+                    "code": 500,
+                    "message": "The question could not be created.",
+                }
+            )
+            return
+
+        for (line_number, _), question in zip(batch, questions):
+            difficulty_index.add(question)
+            yield to_json_line(
+                {"line": line_number, "code": 201, "id": question.id}
+            )
+
+    @app.route("/api/questions:export")
+    def export_questions():
+        """Export all questions as JSON Lines.
+        The questions are read through a server-side cursor and streamed one per line, serialized with orjson when\
+        it's installed.
+        ---
+        tags:
+          - questions
+        produces:
+          - application/x-ndjson
+        responses:
+          200:
+            description: One question per line.
+            schema:
+              $ref: '#/definitions/Question'
+
+        """
+        def generate():
+            selection = (
+                Question.query.order_by(Question.id)
+                .execution_options(stream_results=True)
+                .yield_per(QUESTIONS_PER_BATCH)
+            )
+            for question in selection:
+                yield to_json_line(question.format())
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+
+    @app.route("/api/questions:bulk", methods=["POST"])
+    def apply_questions_bulk():
+        """Create and delete many questions at once.
+        The valid operations are applied within a single transaction, so either all of them are applied or none.
+        ---
+        tags:
+          - questions
+        parameters:
+          - name: body
+            in: body
+            description: The list of operations, up to 1000.
+            schema:
+              properties:
+                operations:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      op:
+                        type: string
+                        enum: [create, delete]
+                      question:
+                        $ref: '#/definitions/Question'
+                      id:
+                        type: integer
+                  example: [{"op":"create","question":{"question":"What is the largest lake in Africa?",\
+                  "answer":"Lake Victoria","category":3,"difficulty":2}},{"op":"delete","id":5}]
+        consumes:
+          - application/json
+        produces:
+          - application/json
+        definitions:
+          BulkResult:
+            type: object
+            properties:
+              index:
+                type: integer
+                example: 0
+              code:
+                type: integer
+                example: 201
+              id:
+                type: integer
+                example: 24
+              message:
+                type: string
+                example: The question doesn't exist.
+              duplicate:
+                type: boolean
+                example: true
+        responses:
+          500:
+            description: If the transaction fails, no operation was applied.
+          400:
+            description: If the body is not a list of operations or holds more than 1000 operations.
+          200:
+            description: The result of each operation in the order they were given, ``201`` for created questions,\
+            ``200`` for deleted ones, ``400`` for invalid operations or categories that don't exist, ``404`` for\
+            questions that don't exist and ``409`` for questions that already exist. A question deleted more than\
+            once gets the result of its first deletion flagged as ``duplicate``.
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    $ref: '#/definitions/BulkResult'
+
+        """
+        body = request.get_json()
+        operations = body.get("operations") if isinstance(body, dict) else None
+        if (
+            not isinstance(operations, list)
+            or len(operations) > MAX_BULK_OPERATIONS
+        ):
+            abort(400)
+
+        results = [None] * len(operations)
+        created = []
+        created_hashes = set()
+        deleted_indexes = {}
+        repeated_deletes = []
+        category_ids = existing_category_ids(operations)
+        for index, operation in enumerate(operations):
+            op = operation.get("op") if isinstance(operation, dict) else None
+            if op == "create":
+                attributes = parse_question(operation.get("question"))
+                if attributes is not None:
+                    if attributes["category"] not in category_ids:
+                        results[index] = {
+                            "index": index,
+                            "code": 400,
+                            "message": "The category doesn't exist.",
+                        }
+                    elif attributes["text_hash"] in created_hashes:
+                        results[index] = conflict_result(index)
+                    else:
+                        created_hashes.add(attributes["text_hash"])
+                        created.append((index, Question(**attributes)))
+                    continue
+            elif op == "delete":
+                question_id = operation.get("id")
+                if isinstance(question_id, int) and not isinstance(
+                    question_id, bool
+                ):
+                    if question_id in deleted_indexes:
+                        repeated_deletes.append(index)
+                    else:
+                        deleted_indexes[question_id] = index
+                    continue
+
+            results[index] = {
+                "index": index,
+                "code": 400,
+                "message": "The operation is invalid or one of its required "
+                           "attributes were missing.",
+            }
+
+        existing_hashes = Question.existing_hashes(created_hashes)
+        for index, question in created:
+            if question.text_hash in existing_hashes:
+                results[index] = conflict_result(index)
+        created = [
+            (index, question)
+            for index, question in created
+            if question.text_hash not in existing_hashes
+        ]
+
+        try:
+            deleted = Question.apply_bulk(
+                [question for _, question in created], list(deleted_indexes)
+            )
+        except exc.SQLAlchemyError:
+            db.session.rollback()
+            return abort(500)
+
+        for index, question in created:
+            difficulty_index.add(question)
+            results[index] = {"index": index, "code": 201, "id": question.id}
+
+        for row in deleted:
+            difficulty_index.remove(row)
+            results[deleted_indexes[row.id]] = {
+                "index": deleted_indexes[row.id],
+                "code": 200,
+                "id": row.id,
+            }
+
+        for index, operation in enumerate(operations):
+            if results[index] is None and index not in repeated_deletes:
+                results[index] = {
+                    "index": index,
+                    "code": 404,
+                    "id": operation["id"],
+                    "message": "The question doesn't exist.",
+                }
+
+        # A question deleted twice gets the result of its first deletion
+        for index in repeated_deletes:
+            first_index = deleted_indexes[operations[index]["id"]]
+            results[index] = dict(
+                results[first_index], index=index, duplicate=True
+            )
+
+        return jsonify({"results": results})
+
+    def existing_category_ids(operations):
+        """Query which of the categories of the questions created by bulk operations exist.
+
+        Args:
+            operations (list) : The bulk operations.
+
+        Returns:
+            The set of the IDs of the existing categories.
+
+        """
+        category_ids = {
+            operation["question"].get("category")
+            for operation in operations
+            if isinstance(operation, dict)
+            and operation.get("op") == "create"
+            and isinstance(operation.get("question"), dict)
+        }
+        category_ids = [
+            category_id
+            for category_id in category_ids
+            if isinstance(category_id, int) and not isinstance(category_id, bool)
+        ]
+        return find_category_ids(category_ids)
+
+    def find_category_ids(category_ids):
+        """Query which of the given categories exist.
+
+        Args:
+            category_ids (list) : The IDs of the categories.
+
+        Returns:
+            The set of the IDs of the existing categories.
+
+        """
+        if not category_ids:
+            return set()
+
+        return {
+            row.id
+            for row in db.session.query(Category.id).filter(
+                Category.id.in_(category_ids)
+            )
+        }
+
+    def conflict_result(index):
+        return {
+            "index": index,
+            "code": 409,
+            "message": "The question already exists.",
+        }
+
     @app.route("/api/quizzes", methods=["POST"])
     def play_game():
         """Get next question of the current quiz.
@@ -443,6 +1112,24 @@ def create_app(test_config=None):
                 quiz_category:
                   description: The category selected for current quiz.
                   $ref: '#/definitions/Category'
+                adaptive:
+                  type: boolean
+                  description: Whether the difficulty of the next question must follow the accuracy of the player.
+                  example: true
+                correct_answers:
+                  type: integer
+                  description: The number of previously answered questions that were correct, used by the adaptive\
+                  mode. It can't be negative nor greater than the number of previous questions.
+                  example: 2
+                bundle_size:
+                  type: integer
+                  description: Return the next unplayed questions, up to 20, in a single response.
+                  example: 5
+                withhold_answers:
+                  type: boolean
+                  description: Used with ``bundle_size``, leave out the answers to check them with\
+                  ``POST /api/quizzes/answers``.
+                  example: true
         consumes:
           - application/json
         produces:
@@ -455,9 +1142,26 @@ def create_app(test_config=None):
                 $ref: '#/definitions/Question'
               quiz_category:
                 $ref: '#/definitions/Category'
+          QuizBundle:
+            type: object
+            properties:
+              questions:
+                type: array
+                items:
+                  $ref: '#/definitions/Question'
+              categories:
+                type: array
+                items:
+                  $ref: '#/definitions/Category'
         responses:
+          400:
+            description: If the ``previous_questions`` aren't question IDs, the ``correct_answers`` is out of range or\
+            the ``bundle_size`` is not a number from 1 to 20.
+          404:
+            description: If there's no question for the selected category, or no unplayed question for a bundle.
           200:
-            description: The next question of the current quiz.
+            description: The next question of the current quiz, or with ``bundle_size`` the next unplayed questions\
+            along with their categories.
             schema:
               $ref: '#/definitions/Quiz'
 
@@ -466,43 +1170,581 @@ def create_app(test_config=None):
         if body is None:
             previous_questions = []
             quiz_category = {}
+            adaptive = False
+            correct_answers = 0
         else:
             previous_questions = body.get("previous_questions", [])
             quiz_category = body.get("quiz_category", {})
+            adaptive = body.get("adaptive", False)
+            correct_answers = body.get("correct_answers", 0)
+
+        if not isinstance(previous_questions, list) or (
+            not all(
+                isinstance(question_id, int)
+                and not isinstance(question_id, bool)
+                for question_id in previous_questions
+            )
+            or not isinstance(correct_answers, int)
+            or isinstance(correct_answers, bool)
+            or not 0 <= correct_answers <= len(previous_questions)
+        ):
+            abort(400)
 
         selection = (
-            Question.query.all()
-            if quiz_category is None or "id" not in quiz_category
-            else Question.query.order_by(Question.id)
-            .filter_by(category=str(quiz_category["id"]))
-            .all()
+            db.session.query(Question, Category)
+            .join(Category, Question.category == Category.id)
+            .order_by(Question.id)
+        )
+        category_id = (
+            quiz_category["id"]
+            if quiz_category is not None and "id" in quiz_category
+            else None
         )
+        if category_id is not None:
+            selection = selection.filter(Question.category == category_id)
+
+        bundle_size = body.get("bundle_size") if body is not None else None
+        if bundle_size is not None:
+            if (
+                not isinstance(bundle_size, int)
+                or isinstance(bundle_size, bool)
+                or not 1 <= bundle_size <= MAX_QUIZ_BUNDLE
+            ):
+                abort(400)
+
+            if adaptive:
+                results = next_adaptive_questions(
+                    selection,
+                    category_id,
+                    previous_questions,
+                    correct_answers,
+                    bundle_size,
+                )
+            elif len(previous_questions):
+                results = (
+                    selection.filter(~Question.id.in_(previous_questions))
+                    .limit(bundle_size)
+                    .all()
+                )
+            else:
+                results = selection.limit(bundle_size).all()
+
+            mode = "adaptive_bundle" if adaptive else "bundle"
+            metrics.quiz_turns.inc((mode,))
+            metrics.quiz_questions.inc((mode,), len(results))
+
+            return format_quiz_bundle(
+                results, body.get("withhold_answers", False)
+            )
 
-        question = None
-        if len(previous_questions):
-            question = next(
-                (q for q in selection if q.id not in previous_questions), None
+        result = None
+        if adaptive:
+            results = next_adaptive_questions(
+                selection,
+                category_id,
+                previous_questions,
+                correct_answers,
+                1,
             )
-        else:
-            question = selection[0]
+            result = results[0] if results else None
 
-        if question is None:
-            question = next(
-                (q for q in selection if q.id == previous_questions[0]),
-                selection[0],
+        if result is None:
+            result = (
+                selection.filter(~Question.id.in_(previous_questions)).first()
+                if len(previous_questions)
+                else selection.first()
+            )
+
+        if result is None and len(previous_questions):
+            result = (
+                selection.filter(Question.id == previous_questions[0]).first()
+                or selection.first()
             )
 
+        if result is None:
+            abort(404)
+
+        mode = "adaptive" if adaptive else "classic"
+        metrics.quiz_turns.inc((mode,))
+        metrics.quiz_questions.inc((mode,))
+
+        question, category = result
         result_question = question.format()
-        category = (
-            Category.query.filter_by(id=str(result_question["category"]))
-            .first()
-            .format()
-        )
+        category = category.format()
 
         return jsonify(
             {"question": result_question, "quiz_category": category}
         )
 
+    def next_adaptive_questions(
+        selection, category_id, previous_questions, correct_answers, count
+    ):
+        """Choose the next questions of the quiz matching the running accuracy of the player.
+
+        The question IDs come from the in-memory difficulty index, so only a lookup by primary keys hits the database.
+
+        Args:
+            selection (~sqlalchemy.orm.query.Query) : The query of questions joined with their categories.
+            category_id (int) : The ID of the category selected for the quiz or ``None`` for every category.
+            previous_questions (list) : The list of IDs of the previously answered questions.
+            correct_answers (int) : The number of previously answered questions that were correct.
+            count (int) : The number of questions to choose.
+
+        Returns:
+            A list of up to ``count`` tuples with the next ``Question`` and its ``Category``, empty if every question\
+            was already played.
+
+        """
+        accuracy = (
+            correct_answers / len(previous_questions)
+            if len(previous_questions)
+            else 0.5
+        )
+        excluded_ids = set(previous_questions)
+
+        results = []
+        while len(results) < count:
+            question_ids = []
+            while len(results) + len(question_ids) < count:
+                question_id = difficulty_index.choose(
+                    category_id, accuracy, excluded_ids
+                )
+                if question_id is None:
+                    break
+                question_ids.append(question_id)
+                excluded_ids.add(question_id)
+
+            if not question_ids:
+                break
+
+            found = {
+                question.id: (question, category)
+                for question, category in selection.filter(
+                    Question.id.in_(question_ids)
+                )
+            }
+            for question_id in question_ids:
+                if question_id in found:
+                    results.append(found[question_id])
+                else:
+                    # The question was removed by another worker
+                    difficulty_index.discard(question_id)
+
+        return results
+
+    def format_quiz_bundle(results, withhold_answers):
+        """Format the questions of a quiz bundle along with their categories.
+
+        Args:
+            results (list) : The tuples of ``Question`` and ``Category`` of the bundle.
+            withhold_answers (bool) : Whether the answers must be left out.
+
+        Returns:
+            The jsonified bundle.
+
+        Raises:
+            HTTPException(404): If there's no question in the bundle.
+
+        """
+        if not results:
+            abort(404)
+
+        questions = []
+        categories = {}
+        for question, category in results:
+            result_question = question.format()
+            if withhold_answers:
+                del result_question["answer"]
+            questions.append(result_question)
+            categories.setdefault(category.id, category.format())
+
+        return jsonify(
+            {"questions": questions, "categories": list(categories.values())}
+        )
+
+    @app.route("/api/quizzes/answers", methods=["POST"])
+    def check_quiz_answers():
+        """Check the answers of questions played with withheld answers.
+        The answers are compared ignoring case, accents and punctuation.
+        ---
+        tags:
+          - quizzes
+        parameters:
+          - name: body
+            in: body
+            description: The answers of the player, up to 20.
+            schema:
+              properties:
+                answers:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                      answer:
+                        type: string
+                  example: [{"id":5,"answer":"maya angelou"},{"id":9,"answer":"George Foreman"}]
+        consumes:
+          - application/json
+        produces:
+          - application/json
+        responses:
+          400:
+            description: If the body is not a list of up to 20 answers with their question ID.
+          200:
+            description: Whether each answer is correct along with the expected answer, which is ``null`` for\
+            questions that don't exist.
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                  example: [{"id":5,"correct":true,"answer":"Maya Angelou"},\
+                  {"id":9,"correct":false,"answer":"Muhammad Ali"}]
+
+        """
+        body = request.get_json()
+        answers = body.get("answers") if isinstance(body, dict) else None
+        if (
+            not isinstance(answers, list)
+            or len(answers) > MAX_QUIZ_BUNDLE
+            or not all(
+                isinstance(a, dict)
+                and isinstance(a.get("id"), int)
+                and isinstance(a.get("answer"), str)
+                for a in answers
+            )
+        ):
+            abort(400)
+
+        expected = {}
+        if answers:
+            expected = dict(
+                db.session.query(Question.id, Question.answer).filter(
+                    Question.id.in_({a["id"] for a in answers})
+                )
+            )
+
+        return jsonify(
+            {
+                "results": [
+                    {
+                        "id": a["id"],
+                        "correct": a["id"] in expected
+                        and normalize(a["answer"])
+                        == normalize(expected[a["id"]]),
+                        "answer": expected.get(a["id"]),
+                    }
+                    for a in answers
+                ]
+            }
+        )
+
+    @app.route("/api/scores", methods=["POST"])
+    def add_score():
+        """Record the score of a quiz played by a player.
+        The score is applied to the leaderboard right away and written to the database in batches.
+        ---
+        tags:
+          - leaderboard
+        parameters:
+          - name: body
+            in: body
+            description: The score JSON attributes.
+            schema:
+              properties:
+                player:
+                  type: string
+                  description: The name of the player.
+                  required: true
+                  example: Maya
+                quiz_category:
+                  description: The category selected for the quiz, omitted or empty for every category.
+                  $ref: '#/definitions/Category'
+                score:
+                  type: integer
+                  description: The number of correct answers.
+                  required: true
+                  example: 4
+        consumes:
+          - application/json
+        produces:
+          - application/json
+        definitions:
+          Score:
+            type: object
+            properties:
+              player:
+                type: string
+                example: Maya
+              category:
+                type: integer
+                example: 4
+              score:
+                type: integer
+                example: 4
+              rank:
+                type: integer
+                example: 1
+        responses:
+          404:
+            description: If the given category doesn't exists.
+          400:
+            description: If the body or the category isn't an object or one of the required parameters were missing.
+          201:
+            description: The best score and the rank of the player in the category.
+            schema:
+              $ref: '#/definitions/Score'
+
+        """
+        body = request.get_json()
+        if not isinstance(body, dict):
+            abort(400)
+
+        player = body.get("player", None)
+        score = body.get("score", None)
+        quiz_category = body.get("quiz_category", None) or {}
+        if not isinstance(quiz_category, dict):
+            abort(400)
+        category_id = quiz_category.get("id", None)
+
+        if (
+            not isinstance(player, str)
+            or not player.strip()
+            or not isinstance(score, int)
+            or isinstance(score, bool)
+            or score < 0
+            or (
+                category_id is not None
+                and (
+                    not isinstance(category_id, int)
+                    or isinstance(category_id, bool)
+                )
+            )
+        ):
+            abort(400)
+
+        if category_id is not None and Category.query.get(category_id) is None:
+            abort(404)
+
+        leaderboard.submit(player.strip(), category_id, score)
+        if leaderboard.checkpoint_due():
+            checkpoint_scores()
+
+        return jsonify(format_rank(player.strip(), category_id)), 201
+
+    @app.route("/api/leaderboard")
+    def get_leaderboard():
+        """Get the players with the best scores.
+        Can be used with a ``category`` parameter to get the leaderboard of a category or ``limit`` parameter to\
+        change the number of players.
+        ---
+        tags:
+          - leaderboard
+        parameters:
+          - name: category
+            in: query
+            type: integer
+            required: false
+            description: The ID of the category, omitted for the quizzes played with every category.
+          - name: limit
+            in: query
+            type: integer
+            required: false
+            description: The number of players, up to 100.
+            default: 10
+        produces:
+          - application/json
+        responses:
+          200:
+            description: A dictionary containing the category and a list of the best scores.
+            schema:
+              type: object
+              properties:
+                category:
+                  type: integer
+                  example: 4
+                scores:
+                  type: array
+                  items:
+                    $ref: '#/definitions/Score'
+
+        """
+        category_id = request.args.get("category", None, type=int)
+        limit = request.args.get("limit", LEADERBOARD_SIZE, type=int)
+        limit = max(0, min(limit, MAX_LEADERBOARD_SIZE))
+
+        scores = [
+            dict(score, category=category_id)
+            for score in leaderboard.top(category_id, limit)
+        ]
+        return jsonify({"category": category_id, "scores": scores})
+
+    @app.route("/api/leaderboard/<string:player>")
+    def get_player_rank(player):
+        """Get the best score and the rank of a player.
+        Can be used with a ``category`` parameter to get the rank in the leaderboard of a category.
+        ---
+        tags:
+          - leaderboard
+        parameters:
+          - name: player
+            in: path
+            type: string
+            required: true
+            description: The name of the player.
+          - name: category
+            in: query
+            type: integer
+            required: false
+            description: The ID of the category, omitted for the quizzes played with every category.
+        produces:
+          - application/json
+        responses:
+          404:
+            description: If the player has no score in the category.
+          200:
+            description: The best score and the rank of the player in the category.
+            schema:
+              $ref: '#/definitions/Score'
+
+        """
+        category_id = request.args.get("category", None, type=int)
+        result = format_rank(player, category_id)
+
+        if result is None:
+            abort(404)
+
+        return jsonify(result)
+
+    def format_rank(player, category_id):
+        """Format the best score and the rank of a player in the leaderboard of a category.
+
+        Args:
+            player (str) : The name of the player.
+            category_id (int) : The ID of the category or ``None`` for every category.
+
+        Returns:
+            A dictionary with the player, the category, the score and the rank or ``None`` if the player has no score\
+            in the category.
+
+        """
+        result = leaderboard.rank(player, category_id)
+        if result is None:
+            return None
+
+        score, rank = result
+        return {
+            "player": player,
+            "category": category_id,
+            "score": score,
+            "rank": rank,
+        }
+
+    @app.route("/metrics")
+    def get_metrics():
+        """Get the metrics of the API in the Prometheus text format.
+        The requests, the database queries, the quiz turns and the search hits are measured by each worker process.
+        ---
+        tags:
+          - monitoring
+        produces:
+          - text/plain
+        responses:
+          200:
+            description: The counters and the histograms of the worker process that answered.
+
+        """
+        return metrics.render()
+
+    @app.route("/api/rate-limits")
+    def get_rate_limits():
+        """Get the counters of the rate limiter, meant for monitoring.
+        ---
+        tags:
+          - monitoring
+        produces:
+          - application/json
+        responses:
+          200:
+            description: The number of allowed and limited requests of each rate limited endpoint, empty if the\
+            rate limiter is disabled.
+            schema:
+              type: object
+              example: {"get_questions":{"allowed":120,"limited":3},"play_game":{"allowed":54,"limited":0}}
+
+        """
+        if rate_limiter is None:
+            return jsonify({})
+        return jsonify(rate_limiter.counters)
+
+    @app.cli.command("reconcile-question-counts")
+    def reconcile_question_counts():
+        """Recount the questions of every category, meant to be run nightly."""
+        Category.reconcile_question_counts()
+
+    @app.cli.command("index-questions")
+    def index_questions():
+        """Compute the text hash and the MinHash signature of the questions that miss them."""
+        click.echo(f"{index_missing_questions()} questions indexed")
+
+    @app.cli.command("find-duplicate-questions")
+    @click.option(
+        "--threshold",
+        default=SIMILARITY_THRESHOLD,
+        show_default=True,
+        help="The estimated similarity from which questions are near-duplicates.",
+    )
+    def find_duplicate_questions(threshold):
+        """Print the clusters of near-duplicate questions as JSON Lines."""
+        index_missing_questions()
+
+        signatures = (
+            db.session.query(Question.id, Question.signature)
+            .execution_options(stream_results=True)
+            .yield_per(QUESTIONS_PER_BATCH)
+        )
+        for ids in cluster(signatures, threshold):
+            questions = (
+                Question.query.filter(Question.id.in_(ids))
+                .order_by(Question.id)
+                .all()
+            )
+            click.echo(
+                json.dumps(
+                    {
+                        "ids": ids,
+                        "questions": [q.question for q in questions],
+                    }
+                )
+            )
+
+    def index_missing_questions():
+        """Compute the text hash and the MinHash signature of the questions that miss them, in batches.
+
+        Returns:
+            The number of indexed questions.
+
+        """
+        count = 0
+        while True:
+            questions = (
+                Question.query.filter(Question.text_hash.is_(None))
+                .limit(QUESTIONS_PER_BATCH)
+                .all()
+            )
+            if not questions:
+                return count
+
+            for question in questions:
+                question.text_hash = text_hash(question.question)
+                question.signature = minhash(question.question)
+            db.session.commit()
+            count += len(questions)
+
     def handle_error(e):
         """Generic error handler for registered all HTTP errors.
 
@@ -0,0 +1,69 @@
+import json
+import os
+
+import click
+from flasgger import Swagger
+from flask import current_app
+from flask.cli import with_appcontext
+
+APIDOCS_RUNTIME = "runtime"
+APIDOCS_PRECOMPILED = "precompiled"
+APIDOCS_DISABLED = "disabled"
+APIDOCS_FILE = "apidocs.json"
+
+
+def setup_apidocs(app):
+    """Set up the Swagger API docs according to the ``APIDOCS`` config.
+
+    - ``runtime`` parses the YAML docstrings of the views on the first request to the API docs.
+    - ``precompiled`` loads the spec compiled by ``flask compile-apidocs`` instead, no docstring is parsed.
+    - ``disabled`` doesn't serve the API docs at all.
+
+    Args:
+        app (~flask.Flask) : The flask application.
+
+    Returns:
+        The ``Swagger`` instance or ``None`` if the API docs are disabled.
+
+    Raises:
+        ValueError: If the ``APIDOCS`` config is unknown.
+
+    """
+    app.cli.add_command(compile_apidocs)
+
+    mode = app.config["APIDOCS"]
+    if mode == APIDOCS_DISABLED:
+        return None
+    elif mode == APIDOCS_PRECOMPILED:
+        config = dict(
+            Swagger.DEFAULT_CONFIG,
+            specs=[
+                dict(spec, rule_filter=lambda rule: False)
+                for spec in Swagger.DEFAULT_CONFIG["specs"]
+            ],
+        )
+        return Swagger(
+            app, config=config, template_file=app.config["APIDOCS_FILE"]
+        )
+    elif mode == APIDOCS_RUNTIME:
+        return Swagger(app)
+
+    raise ValueError(f"Unknown APIDOCS config: {mode}")
+
+
+@click.command("compile-apidocs")
+@with_appcontext
+def compile_apidocs():
+    """Compile the Swagger spec from the view docstrings to the APIDOCS_FILE."""
+    if current_app.config["APIDOCS"] != APIDOCS_RUNTIME:
+        raise click.ClickException(
+            f"The API docs can only be compiled with APIDOCS={APIDOCS_RUNTIME}."
+        )
+
+    filename = os.path.join(
+        current_app.root_path, current_app.config["APIDOCS_FILE"]
+    )
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(current_app.swag.get_apispecs(), f)
+
+    click.echo(f"API docs compiled to {filename}")
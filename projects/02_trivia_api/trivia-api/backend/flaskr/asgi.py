@@ -0,0 +1,20 @@
+from asgiref.wsgi import WsgiToAsgi
+
+from . import create_app
+
+
+def create_asgi_app(test_config=None):
+    """Create the app exposed through the ASGI interface.
+
+    The routes are the same ones of :func:`~flaskr.create_app`, wrapped for the deployments that require an ASGI
+    server like uvicorn. The views stay synchronous and every request holds a thread of the pool sized by the
+    ``ASGI_THREADS`` environment variable, so this brings no concurrency gain over the WSGI server.
+
+    Args:
+        test_config (dict) : Used in a testing environment.
+
+    Returns:
+        ASGI application.
+
+    """
+    return WsgiToAsgi(create_app(test_config))
@@ -0,0 +1,336 @@
+import bisect
+import threading
+import time
+
+INITIAL_MAX_SCORE = 16
+
+
+class ScoreCounts:
+    """Fenwick tree counting players by score, answering how many players have a greater score in logarithmic time.
+
+    Attributes:
+        tree (list) : The Fenwick tree indexed by ``score + 1``.
+
+    """
+
+    def __init__(self, max_score=INITIAL_MAX_SCORE):
+        self.tree = [0] * (max_score + 2)
+
+    @property
+    def max_score(self):
+        return len(self.tree) - 2
+
+    def update(self, score, delta):
+        index = score + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def count_up_to(self, score):
+        """Count the players with a score lower or equal to ``score``."""
+        index = min(score, self.max_score) + 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def count_greater(self, score):
+        """Count the players with a score greater than ``score``."""
+        return self.count_up_to(self.max_score) - self.count_up_to(score)
+
+
+class CategoryLeaderboard:
+    """The best score of each player for a single quiz category.
+
+    Attributes:
+        scores (dict) : The best score of each player.
+        players_by_score (dict) : The players holding each score, in the order they reached it.
+        distinct_scores (list) : The scores held by at least one player, sorted in ascending order.
+        counts (ScoreCounts) : The number of players holding each score.
+
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.players_by_score = {}
+        self.distinct_scores = []
+        self.counts = ScoreCounts()
+
+    def submit(self, player, score):
+        """Keep the score of a player if it's the best one so far.
+
+        Returns:
+            ``True`` if the leaderboard was changed.
+
+        """
+        previous_score = self.scores.get(player)
+        if previous_score is not None and previous_score >= score:
+            return False
+
+        if previous_score is not None:
+            del self.players_by_score[previous_score][player]
+            if not self.players_by_score[previous_score]:
+                del self.players_by_score[previous_score]
+                del self.distinct_scores[
+                    bisect.bisect_left(self.distinct_scores, previous_score)
+                ]
+            self.counts.update(previous_score, -1)
+
+        if score > self.counts.max_score:
+            self._grow(score)
+
+        self.scores[player] = score
+        if score not in self.players_by_score:
+            self.players_by_score[score] = {}
+            bisect.insort(self.distinct_scores, score)
+        self.players_by_score[score][player] = None
+        self.counts.update(score, 1)
+        return True
+
+    def rank(self, player):
+        """Get the rank of a player, players with the same score share the same rank.
+
+        Returns:
+            The rank starting from 1 or ``None`` if the player has no score.
+
+        """
+        score = self.scores.get(player)
+        if score is None:
+            return None
+        return self.counts.count_greater(score) + 1
+
+    def top(self, limit):
+        """Get the players with the best scores.
+
+        Walks the sorted distinct scores from the highest one, so it costs ``limit`` whatever the number of players.
+
+        Returns:
+            A list of dictionaries with ``player``, ``score`` and ``rank``.
+
+        """
+        result = []
+        for score in reversed(self.distinct_scores):
+            rank = len(result) + 1
+            for player in self.players_by_score[score]:
+                if len(result) == limit:
+                    return result
+                result.append({"player": player, "score": score, "rank": rank})
+        return result
+
+    def _grow(self, score):
+        max_score = self.counts.max_score
+        while max_score < score:
+            max_score *= 2
+
+        self.counts = ScoreCounts(max_score)
+        for held_score, players in self.players_by_score.items():
+            self.counts.update(held_score, len(players))
+
+
+class Leaderboard:
+    """In-memory leaderboards of every quiz category backed by the ``scores`` table.
+
+    The leaderboards are loaded from the database on first use. Submitted scores are applied in memory right away and
+    written to the database in batches by :meth:`checkpoint`, which is due once ``batch_size`` scores are pending or
+    ``checkpoint_interval`` seconds after the last checkpoint. The thread of :meth:`schedule` runs the checkpoints on
+    that schedule and :meth:`reload` every ``reload_interval`` seconds, so the scores recorded by the other worker
+    processes are ranked too without any request waiting for the database. The ``None`` category holds the quizzes
+    played with every category.
+
+    Attributes:
+        loader (callable) : Returns an iterable of ``(player, category, score)`` tuples of the best scores.
+        writer (callable) : Persists a list of ``(player, category, score)`` tuples within a single transaction.
+        batch_size (int) : The number of pending scores that triggers a checkpoint.
+        checkpoint_interval (float) : The number of seconds between checkpoints.
+        reload_interval (float) : The number of seconds between reloads from the database.
+
+    """
+
+    def __init__(
+        self,
+        loader,
+        writer,
+        batch_size=100,
+        checkpoint_interval=5.0,
+        reload_interval=30.0,
+    ):
+        self.loader = loader
+        self.writer = writer
+        self.batch_size = batch_size
+        self.checkpoint_interval = checkpoint_interval
+        self.reload_interval = reload_interval
+        self.categories = None
+        self.loaded_at = None
+        self.pending = []
+        self.writing = []
+        # The scores submitted while a reload queries the database, or ``None``
+        self.reloading = None
+        self.last_checkpoint = time.monotonic()
+        self.lock = threading.Lock()
+        # Held for a whole reload, so only one queries the database at a time
+        self.reload_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def load(self):
+        """Build the leaderboards from the database if they weren't built yet."""
+        if self.categories is None:
+            self.reload(only_if_missing=True)
+
+    def reload(self, only_if_missing=False):
+        """Build the leaderboards again from the database.
+
+        The database is queried without holding the lock, so the requests keep being served meanwhile, then the scores
+        that may be missing from the query, the ones not written yet and the ones submitted meanwhile, are applied
+        again on top of the loaded ones.
+
+        Args:
+            only_if_missing (bool) : Only build the leaderboards if they weren't built yet.
+
+        """
+        with self.reload_lock:
+            with self.lock:
+                if only_if_missing and self.categories is not None:
+                    return
+                self.reloading = [*self.writing, *self.pending]
+
+            try:
+                categories = {}
+                for player, category, score in self.loader():
+                    categories.setdefault(
+                        category, CategoryLeaderboard()
+                    ).submit(player, score)
+            except Exception:
+                with self.lock:
+                    self.reloading = None
+                raise
+
+            with self.lock:
+                for player, category, score in self.reloading:
+                    categories.setdefault(
+                        category, CategoryLeaderboard()
+                    ).submit(player, score)
+                self.reloading = None
+                self.categories = categories
+                self.loaded_at = time.monotonic()
+
+    def reload_due(self):
+        """Whether the leaderboards were loaded more than ``reload_interval`` seconds ago."""
+        return (
+            self.categories is not None
+            and time.monotonic() - self.loaded_at >= self.reload_interval
+        )
+
+    def submit(self, player, category, score):
+        """Record the score of a quiz played by a player.
+
+        Args:
+            player (str) : The name of the player.
+            category (int) : The ID of the category of the quiz or ``None`` for every category.
+            score (int) : The number of correct answers.
+
+        Returns:
+            The rank of the player in the category.
+
+        """
+        self.load()
+
+        with self.lock:
+            leaderboard = self.categories.setdefault(
+                category, CategoryLeaderboard()
+            )
+            leaderboard.submit(player, score)
+            self.pending.append((player, category, score))
+            if self.reloading is not None:
+                self.reloading.append((player, category, score))
+            return leaderboard.rank(player)
+
+    def rank(self, player, category):
+        """Get the best score and the rank of a player in a category.
+
+        Returns:
+            A tuple with the score and the rank or ``None`` if the player has no score in the category.
+
+        """
+        self.load()
+
+        with self.lock:
+            leaderboard = self.categories.get(category)
+            if leaderboard is None or player not in leaderboard.scores:
+                return None
+            return leaderboard.scores[player], leaderboard.rank(player)
+
+    def top(self, category, limit):
+        """Get the players with the best scores of a category.
+
+        Returns:
+            A list of dictionaries with ``player``, ``score`` and ``rank``.
+
+        """
+        self.load()
+
+        with self.lock:
+            leaderboard = self.categories.get(category)
+            return leaderboard.top(limit) if leaderboard is not None else []
+
+    def checkpoint_due(self):
+        """Whether there are enough pending scores or enough time passed since the last checkpoint."""
+        return bool(self.pending) and (
+            len(self.pending) >= self.batch_size
+            or time.monotonic() - self.last_checkpoint
+            >= self.checkpoint_interval
+        )
+
+    def checkpoint(self):
+        """Write the pending scores to the database.
+
+        The scores are put back to the pending list if the write fails, so they are retried on the next checkpoint.
+
+        """
+        with self.lock:
+            pending, self.pending = self.pending, []
+            # Kept until written, so a reload in between doesn't lose them
+            self.writing = pending
+            self.last_checkpoint = time.monotonic()
+
+        if not pending:
+            return
+
+        try:
+            self.writer(pending)
+        except Exception:
+            with self.lock:
+                self.pending[:0] = pending
+            raise
+        finally:
+            with self.lock:
+                self.writing = []
+
+    def schedule(self, checkpoint, reload):
+        """Run a checkpoint every ``checkpoint_interval`` seconds, and a reload once due, from a daemon thread until
+        :meth:`stop` is called.
+
+        Args:
+            checkpoint (callable) : Runs :meth:`checkpoint`, e.g. within an application context.
+            reload (callable) : Runs :meth:`reload`, e.g. within an application context.
+
+        Returns:
+            The started thread.
+
+        """
+
+        def run():
+            while not self.stopped.wait(self.checkpoint_interval):
+                checkpoint()
+                if self.reload_due():
+                    reload()
+
+        thread = threading.Thread(
+            target=run, name="leaderboard-schedule", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop the scheduled checkpoints and reloads."""
+        self.stopped.set()
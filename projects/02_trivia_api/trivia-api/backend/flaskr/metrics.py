@@ -0,0 +1,244 @@
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+SEARCH_HITS_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000)
+UNMATCHED_ENDPOINT = "unmatched"
+
+
+def format_labels(labelnames, labelvalues):
+    if not labelnames:
+        return ""
+    pairs = (
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """A monotonically increasing value per combination of labels.
+
+    Increments take no lock, a concurrent increment of the same labels may rarely be lost, which is fine for
+    monitoring.
+
+    Attributes:
+        name (str) : The name of the metric.
+        documentation (str) : The help text of the metric.
+        labelnames (tuple) : The names of the labels.
+        values (dict) : The value of each tuple of label values.
+
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, labelvalues=(), amount=1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labelvalues, value in sorted(self.values.items()):
+            labels = format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}{labels} {value}"
+
+
+class HistogramValues:
+    """The bucket counts and the sum of the observations of a histogram for one combination of labels."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """Observations counted in buckets per combination of labels.
+
+    The buckets are allocated once per combination of labels, an observation costs a binary search and two additions
+    without any lock.
+
+    Attributes:
+        name (str) : The name of the metric.
+        documentation (str) : The help text of the metric.
+        labelnames (tuple) : The names of the labels.
+        buckets (tuple) : The sorted upper bounds of the buckets, the ``+Inf`` bucket is implied.
+        values (dict) : The :class:`HistogramValues` of each tuple of label values.
+
+    """
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, labelvalues=()):
+        values = self.values.get(labelvalues)
+        if values is None:
+            values = self.values.setdefault(
+                labelvalues, HistogramValues(len(self.buckets) + 1)
+            )
+        values.counts[bisect_left(self.buckets, value)] += 1
+        values.sum += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        labelnames = self.labelnames + ("le",)
+        for labelvalues, values in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(
+                self.buckets + ("+Inf",), list(values.counts)
+            ):
+                cumulative += count
+                labels = format_labels(labelnames, labelvalues + (bound,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {values.sum}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Metrics:
+    """The metrics of the Trivia API, exposed in the Prometheus text format.
+
+    Attributes:
+        requests (Counter) : The requests by endpoint, method and status.
+        request_duration (Histogram) : The duration of the requests by endpoint.
+        queries (Counter) : The database queries by endpoint.
+        query_duration (Histogram) : The duration of the database queries by endpoint.
+        quiz_turns (Counter) : The quiz requests by mode.
+        quiz_questions (Counter) : The questions served to quizzes by mode.
+        search_hits (Histogram) : The number of questions matching each search.
+        collectors (list) : Callables yielding extra lines of metrics, computed when rendered.
+
+    """
+
+    def __init__(self):
+        self.requests = Counter(
+            "trivia_http_requests_total",
+            "The number of HTTP requests.",
+            ("endpoint", "method", "status"),
+        )
+        self.request_duration = Histogram(
+            "trivia_http_request_duration_seconds",
+            "The duration of the HTTP requests.",
+            ("endpoint",),
+        )
+        self.queries = Counter(
+            "trivia_db_queries_total",
+            "The number of database queries.",
+            ("endpoint",),
+        )
+        self.query_duration = Histogram(
+            "trivia_db_query_duration_seconds",
+            "The duration of the database queries.",
+            ("endpoint",),
+        )
+        self.quiz_turns = Counter(
+            "trivia_quiz_turns_total",
+            "The number of quiz requests.",
+            ("mode",),
+        )
+        self.quiz_questions = Counter(
+            "trivia_quiz_questions_total",
+            "The number of questions served to quizzes.",
+            ("mode",),
+        )
+        self.search_hits = Histogram(
+            "trivia_search_hits",
+            "The number of questions matching each search.",
+            buckets=SEARCH_HITS_BUCKETS,
+        )
+        self.collectors = []
+
+    def init_app(self, app, engine):
+        """Measure the requests of an app and the queries of its engine.
+
+        Args:
+            app (~flask.Flask) : The flask application.
+            engine (~sqlalchemy.engine.Engine) : The engine of the app.
+
+        """
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        event.listen(engine, "before_cursor_execute", self._start_query)
+        event.listen(engine, "after_cursor_execute", self._end_query)
+        event.listen(engine, "handle_error", self._fail_query)
+
+    def render(self):
+        """Render every metric in the Prometheus text format.
+
+        Returns:
+            The ``text/plain`` response.
+
+        """
+        metrics = (
+            self.requests,
+            self.request_duration,
+            self.queries,
+            self.query_duration,
+            self.quiz_turns,
+            self.quiz_questions,
+            self.search_hits,
+        )
+        lines = [line for metric in metrics for line in metric.render()]
+        for collector in self.collectors:
+            lines.extend(collector())
+        return Response("\n".join(lines) + "\n", content_type=CONTENT_TYPE)
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+
+    def _end_request(self, response):
+        if "metrics_start" in g:
+            endpoint = request.endpoint or UNMATCHED_ENDPOINT
+            self.request_duration.observe(
+                time.perf_counter() - g.metrics_start, (endpoint,)
+            )
+            self.requests.inc(
+                (endpoint, request.method, str(response.status_code))
+            )
+        return response
+
+    # A connection runs one query at a time, so a single start time is kept, which a failed query without any
+    # after_cursor_execute drops in handle_error
+    def _start_query(self, conn, *args):
+        conn.info["metrics_query_start"] = time.perf_counter()
+
+    def _fail_query(self, exception_context):
+        if exception_context.connection is not None:
+            exception_context.connection.info.pop("metrics_query_start", None)
+
+    def _end_query(self, conn, *args):
+        start = conn.info.pop("metrics_query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = (
+            request.endpoint or UNMATCHED_ENDPOINT
+            if has_request_context()
+            else "none"
+        )
+        self.queries.inc((endpoint,))
+        self.query_duration.observe(elapsed, (endpoint,))
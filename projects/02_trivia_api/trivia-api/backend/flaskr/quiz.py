@@ -0,0 +1,278 @@
+import random
+import threading
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+MAX_RANDOM_PICKS = 8
+
+
+class DifficultyBucket:
+    """A set of question IDs supporting constant time add, remove and random choice.
+
+    Attributes:
+        ids (list) : The question IDs of the bucket.
+        positions (dict) : The position of each question ID within ``ids``.
+
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, question_id):
+        if question_id in self.positions:
+            return
+        self.positions[question_id] = len(self.ids)
+        self.ids.append(question_id)
+
+    def remove(self, question_id):
+        position = self.positions.pop(question_id, None)
+        if position is None:
+            return
+        last_id = self.ids.pop()
+        if last_id != question_id:
+            self.ids[position] = last_id
+            self.positions[last_id] = position
+
+    def choose(self, excluded_ids):
+        """Choose a random question ID which is not excluded.
+
+        A few random picks are tried first, which is enough for a quiz where only a small part of the bucket was\
+        already played, then the bucket is scanned from a random offset. The caller must hold the lock of the index,
+        since :meth:`add` and :meth:`remove` reorder the IDs.
+
+        Args:
+            excluded_ids (set) : The question IDs that must not be chosen.
+
+        Returns:
+            A question ID or ``None`` if every question of the bucket is excluded.
+
+        """
+        if not self.ids:
+            return None
+
+        for _ in range(MAX_RANDOM_PICKS):
+            question_id = random.choice(self.ids)
+            if question_id not in excluded_ids:
+                return question_id
+
+        offset = random.randrange(len(self.ids))
+        return next(
+            (
+                self.ids[(offset + i) % len(self.ids)]
+                for i in range(len(self.ids))
+                if self.ids[(offset + i) % len(self.ids)] not in excluded_ids
+            ),
+            None,
+        )
+
+
+class DifficultyIndex:
+    """In-memory index of question IDs bucketed by category and difficulty.
+
+    The index is loaded on first use and kept up to date incrementally through :meth:`add` and :meth:`remove`. The
+    thread of :meth:`schedule` rebuilds it every ``reload_interval`` seconds, so the questions added or deleted by the
+    other worker processes are picked up too. The ``None`` category holds the questions of every category.
+
+    Attributes:
+        loader (callable) : Returns an iterable of ``(id, category, difficulty)`` tuples of all questions.
+        reload_interval (float) : The number of seconds between rebuilds from the database.
+        buckets (dict) : The difficulty buckets of each category.
+
+    """
+
+    def __init__(self, loader, reload_interval=30.0):
+        self.loader = loader
+        self.reload_interval = reload_interval
+        self.buckets = None
+        # The changes made while a reload queries the database, or ``None``
+        self.reloading = None
+        self.lock = threading.Lock()
+        # Held for a whole reload, so only one queries the database at a time
+        self.reload_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def load(self):
+        """Build the buckets from all questions if they weren't built yet."""
+        if self.buckets is None:
+            self.reload(only_if_missing=True)
+
+    def reload(self, only_if_missing=False):
+        """Build the buckets again from all questions.
+
+        The database is queried without holding the lock, then the questions added and removed meanwhile are applied
+        again on top of the loaded ones.
+
+        Args:
+            only_if_missing (bool) : Only build the buckets if they weren't built yet.
+
+        """
+        with self.reload_lock:
+            with self.lock:
+                if only_if_missing and self.buckets is not None:
+                    return
+                self.reloading = []
+
+            try:
+                buckets = {}
+                for question_id, category, difficulty in self.loader():
+                    add_to_buckets(buckets, question_id, category, difficulty)
+            except Exception:
+                with self.lock:
+                    self.reloading = None
+                raise
+
+            with self.lock:
+                for change, *arguments in self.reloading:
+                    change(buckets, *arguments)
+                self.reloading = None
+                self.buckets = buckets
+
+    def add(self, question):
+        """Add a question to the buckets of its category and difficulty.
+
+        Args:
+            question (Question) : The question that was inserted.
+
+        """
+        self._change(
+            add_to_buckets, question.id, question.category, question.difficulty
+        )
+
+    def remove(self, question):
+        """Remove a question from the buckets of its category and difficulty.
+
+        Args:
+            question (Question) : The question that was deleted.
+
+        """
+        self._change(
+            remove_from_buckets,
+            question.id,
+            question.category,
+            question.difficulty,
+        )
+
+    def discard(self, question_id):
+        """Remove a question ID from every bucket, used when it no longer exists in the database.
+
+        Args:
+            question_id (int) : The ID of the question.
+
+        """
+        self._change(discard_from_buckets, question_id)
+
+    def choose(self, category_id, accuracy, excluded_ids):
+        """Choose the next question for the running accuracy of a player.
+
+        The bucket of the matching difficulty is tried first, then the closest ones.
+
+        Args:
+            category_id (int) : The ID of the category or ``None`` for every category.
+            accuracy (float) : The ratio of correct answers, from 0 to 1.
+            excluded_ids (set) : The question IDs that were already played.
+
+        Returns:
+            A question ID or ``None`` if every question of the category was already played.
+
+        """
+        self.load()
+
+        target = target_difficulty(accuracy)
+        with self.lock:
+            category_buckets = self.buckets.get(category_id, {})
+            for distance in range(MAX_DIFFICULTY - MIN_DIFFICULTY + 1):
+                for difficulty in {target - distance, target + distance}:
+                    bucket = category_buckets.get(difficulty)
+                    question_id = bucket.choose(excluded_ids) if bucket else None
+                    if question_id is not None:
+                        return question_id
+
+        return None
+
+    def schedule(self, reload):
+        """Run a reload every ``reload_interval`` seconds from a daemon thread until :meth:`stop` is called.
+
+        Args:
+            reload (callable) : Runs :meth:`reload`, e.g. within an application context.
+
+        Returns:
+            The started thread.
+
+        """
+
+        def run():
+            while not self.stopped.wait(self.reload_interval):
+                if self.buckets is not None:
+                    reload()
+
+        thread = threading.Thread(
+            target=run, name="difficulty-index-reload", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop the scheduled reloads."""
+        self.stopped.set()
+
+    def _change(self, change, *arguments):
+        if self.buckets is None:
+            return
+        with self.lock:
+            change(self.buckets, *arguments)
+            if self.reloading is not None:
+                self.reloading.append((change, *arguments))
+
+
+def add_to_buckets(buckets, question_id, category, difficulty):
+    """Add a question ID to the buckets of its category, and of every category, for its difficulty."""
+    difficulty = clamp_difficulty(difficulty)
+    for key in {None, category}:
+        buckets.setdefault(key, {}).setdefault(
+            difficulty, DifficultyBucket()
+        ).add(question_id)
+
+
+def remove_from_buckets(buckets, question_id, category, difficulty):
+    """Remove a question ID from the buckets of its category, and of every category, for its difficulty."""
+    difficulty = clamp_difficulty(difficulty)
+    for key in {None, category}:
+        bucket = buckets.get(key, {}).get(difficulty)
+        if bucket is not None:
+            bucket.remove(question_id)
+
+
+def discard_from_buckets(buckets, question_id):
+    """Remove a question ID from every bucket."""
+    for category_buckets in buckets.values():
+        for bucket in category_buckets.values():
+            bucket.remove(question_id)
+
+
+def clamp_difficulty(difficulty):
+    """Bring a difficulty into the range from ``MIN_DIFFICULTY`` to ``MAX_DIFFICULTY``.
+
+    The questions stored before the difficulty was validated may hold anything, which counts as ``MIN_DIFFICULTY``.
+
+    """
+    if not isinstance(difficulty, int) or isinstance(difficulty, bool):
+        return MIN_DIFFICULTY
+    return max(MIN_DIFFICULTY, min(MAX_DIFFICULTY, difficulty))
+
+
+def target_difficulty(accuracy):
+    """Map the ratio of correct answers of a player to a difficulty.
+
+    Args:
+        accuracy (float) : The ratio of correct answers, from 0 to 1.
+
+    Returns:
+        The difficulty from ``MIN_DIFFICULTY`` to ``MAX_DIFFICULTY``.
+
+    """
+    accuracy = max(0.0, min(1.0, accuracy))
+    return MIN_DIFFICULTY + round(accuracy * (MAX_DIFFICULTY - MIN_DIFFICULTY))
@@ -0,0 +1,211 @@
+import math
+import threading
+import time
+
+from flask import abort, current_app, g, request
+
+API_KEY_HEADER = "X-API-Key"
+PRUNE_INTERVAL = 60.0
+
+
+class MemoryBackend:
+    """Token buckets held in the memory of the process.
+
+    Each worker process limits the clients on its own, use a shared backend like :class:`RedisBackend` to enforce the
+    limits across workers.
+
+    Attributes:
+        buckets (dict) : The tokens left, the time of the last refill and the time the bucket expires of each bucket.
+
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.last_prune = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        """Take tokens from a bucket refilled at ``rate`` tokens per second up to ``burst`` tokens.
+
+        Args:
+            key (str) : The key of the bucket.
+            rate (float) : The number of tokens added to the bucket per second.
+            burst (int) : The capacity of the bucket.
+            cost (int) : The number of tokens to take.
+
+        Returns:
+            ``0`` if the tokens were taken, otherwise the number of seconds until there will be enough tokens.
+
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_prune >= PRUNE_INTERVAL:
+                self._prune(now)
+
+            tokens, updated, _ = self.buckets.get(key, (burst, now, None))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            # Like the EXPIRE of the Redis backend, the bucket is full again once it expires
+            expires = now + burst / rate
+            if tokens < cost:
+                self.buckets[key] = (tokens, now, expires)
+                return (cost - tokens) / rate
+
+            self.buckets[key] = (tokens - cost, now, expires)
+            return 0
+
+    def _prune(self, now):
+        # Expired buckets are full again, forgetting them changes nothing
+        self.buckets = {
+            key: bucket
+            for key, bucket in self.buckets.items()
+            if now < bucket[2]
+        }
+        self.last_prune = now
+
+
+class RedisBackend:
+    """Token buckets shared by every worker through Redis.
+
+    The refill and the take happen atomically within a Lua script, so concurrent workers can't overdraw a bucket.
+
+    Attributes:
+        client (redis.Redis) : The Redis client.
+
+    """
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = redis.call("TIME")
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+
+    local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+
+    local retry_after = 0
+    if tokens < cost then
+        retry_after = (cost - tokens) / rate
+    else
+        tokens = tokens - cost
+    end
+
+    redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+    redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(self.SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+    def consume(self, key, rate, burst, cost=1):
+        """Take tokens from a bucket, see :meth:`MemoryBackend.consume`."""
+        return float(
+            self.script(keys=[f"ratelimit:{key}"], args=[rate, burst, cost])
+        )
+
+
+def create_backend(storage_url):
+    """Create the backend of the rate limiter for a storage URL.
+
+    Args:
+        storage_url (str) : ``None`` or ``memory://`` to keep the buckets in memory, or a ``redis://`` URL.
+
+    Returns:
+        The backend.
+
+    Raises:
+        ValueError: If the scheme of the storage URL is unknown.
+
+    """
+    if not storage_url or storage_url.startswith("memory://"):
+        return MemoryBackend()
+    elif storage_url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend.from_url(storage_url)
+
+    raise ValueError(f"Unknown RATE_LIMIT_STORAGE_URL: {storage_url}")
+
+
+def client_key():
+    """Identify the client by its API key if it's one of the ``RATE_LIMIT_API_KEYS`` or otherwise by its IP address.
+
+    Unknown API keys are ignored, otherwise a client could get a new bucket with each request by sending a new key.
+
+    """
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key and api_key in current_app.config.get("RATE_LIMIT_API_KEYS", ()):
+        return f"key:{api_key}"
+    return f"ip:{request.remote_addr}"
+
+
+class RateLimiter:
+    """Limit the requests of each client to the endpoints of an app with token buckets.
+
+    A request over the limit is aborted with ``429 Too Many Requests`` and a ``Retry-After`` header.
+
+    Attributes:
+        backend : Holds the token buckets, see :class:`MemoryBackend`.
+        limits (dict) : The ``(rate, burst, cost)`` of each limited endpoint.
+        counters (dict) : The number of ``allowed`` and ``limited`` requests of each limited endpoint.
+
+    """
+
+    def __init__(self, app, backend, key_func=client_key):
+        self.backend = backend
+        self.key_func = key_func
+        self.limits = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+        app.before_request(self.check)
+        app.after_request(self.add_retry_after)
+
+    def limit(self, endpoint, rate, burst, cost=None):
+        """Limit the requests of each client to an endpoint.
+
+        Args:
+            endpoint (str) : The name of the endpoint.
+            rate (float) : The number of requests allowed per second in the long run.
+            burst (int) : The number of requests allowed at once.
+            cost (callable) : Returns the number of tokens the current request takes, 1 by default.
+
+        """
+        self.limits[endpoint] = (rate, burst, cost)
+        self.counters[endpoint] = {"allowed": 0, "limited": 0}
+
+    def check(self):
+        """Take the tokens of the current request or abort it if the client is over the limit."""
+        limit = self.limits.get(request.endpoint)
+        if limit is None:
+            return
+
+        rate, burst, cost = limit
+        retry_after = self.backend.consume(
+            f"{request.endpoint}:{self.key_func()}",
+            rate,
+            burst,
+            cost() if cost is not None else 1,
+        )
+
+        with self.lock:
+            self.counters[request.endpoint][
+                "limited" if retry_after else "allowed"
+            ] += 1
+
+        if retry_after:
+            g.retry_after = math.ceil(retry_after)
+            abort(429)
+
+    def add_retry_after(self, response):
+        if "retry_after" in g:
+            response.headers["Retry-After"] = str(g.retry_after)
+        return response
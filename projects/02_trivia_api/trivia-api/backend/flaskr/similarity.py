@@ -0,0 +1,165 @@
+import hashlib
+import random
+import re
+import struct
+import unicodedata
+from collections import defaultdict
+
+SHINGLE_SIZE = 3
+PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.7
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+SIGNATURE_FORMAT = f">{PERMUTATIONS}I"
+
+# Fixed seed, the signatures stored in the database must stay comparable across processes
+_generator = random.Random(20201019)
+_PERMUTATIONS = [
+    (
+        _generator.randrange(1, MERSENNE_PRIME),
+        _generator.randrange(0, MERSENNE_PRIME),
+    )
+    for _ in range(PERMUTATIONS)
+]
+
+
+def normalize(text):
+    """Normalize the text of a question, ignoring case, accents, punctuation and spacing.
+
+    Args:
+        text (str) : The text of the question.
+
+    Returns:
+        The normalized text.
+
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def text_hash(text):
+    """Hash the normalized text of a question, equal for exact duplicates.
+
+    Returns:
+        The hexadecimal SHA-1 digest of the normalized text.
+
+    """
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text):
+    """Split the normalized text of a question into overlapping sequences of ``SHINGLE_SIZE`` words.
+
+    Returns:
+        A set of the 32-bit hashes of the shingles.
+
+    """
+    words = normalize(text).split()
+    if len(words) < SHINGLE_SIZE:
+        words = [" ".join(words)]
+    else:
+        words = [
+            " ".join(words[i:i + SHINGLE_SIZE])
+            for i in range(len(words) - SHINGLE_SIZE + 1)
+        ]
+    return {
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(),
+            "big",
+        )
+        for shingle in words
+    }
+
+
+def minhash(text):
+    """Compute the MinHash signature of the text of a question.
+
+    The ratio of equal values of two signatures estimates the Jaccard similarity of the shingles of both texts.
+
+    Returns:
+        The signature packed as ``bytes``.
+
+    """
+    values = shingles(text)
+    signature = [
+        min(((a * value + b) % MERSENNE_PRIME) & MAX_HASH for value in values)
+        for a, b in _PERMUTATIONS
+    ]
+    return struct.pack(SIGNATURE_FORMAT, *signature)
+
+
+def similarity(signature, other):
+    """Estimate the Jaccard similarity of two packed MinHash signatures."""
+    values = struct.unpack(SIGNATURE_FORMAT, signature)
+    other_values = struct.unpack(SIGNATURE_FORMAT, other)
+    return sum(a == b for a, b in zip(values, other_values)) / PERMUTATIONS
+
+
+def band_keys(signature):
+    """Split a packed MinHash signature into the locality sensitive hashing bands.
+
+    Two texts share at least one band with a probability that grows quickly with their similarity.
+
+    Returns:
+        A list of ``(band, bytes)`` keys.
+
+    """
+    size = ROWS_PER_BAND * 4
+    return [
+        (band, signature[band * size:(band + 1) * size])
+        for band in range(BANDS)
+    ]
+
+
+def cluster(signatures, threshold=SIMILARITY_THRESHOLD):
+    """Group the near-duplicates among many questions.
+
+    The questions are bucketed by their LSH bands, and only the questions sharing a bucket are compared, so the cost
+    grows roughly linearly with the number of questions instead of comparing every pair.
+
+    Args:
+        signatures (iterable) : The ``(id, signature)`` tuples of the questions.
+        threshold (float) : The estimated Jaccard similarity from which two questions are near-duplicates.
+
+    Returns:
+        A list of clusters, each one a sorted list of at least two question IDs.
+
+    """
+    signatures = dict(signatures)
+    parents = {question_id: question_id for question_id in signatures}
+
+    def find(question_id):
+        while parents[question_id] != question_id:
+            parents[question_id] = parents[parents[question_id]]
+            question_id = parents[question_id]
+        return question_id
+
+    buckets = defaultdict(list)
+    for question_id, signature in signatures.items():
+        for key in band_keys(signature):
+            buckets[key].append(question_id)
+
+    for bucket in buckets.values():
+        for i, question_id in enumerate(bucket):
+            for other_id in bucket[:i]:
+                root, other_root = find(question_id), find(other_id)
+                if root == other_root:
+                    continue
+                if (
+                    similarity(signatures[question_id], signatures[other_id])
+                    >= threshold
+                ):
+                    parents[root] = other_root
+
+    clusters = defaultdict(list)
+    for question_id in signatures:
+        clusters[find(question_id)].append(question_id)
+
+    return sorted(
+        (sorted(ids) for ids in clusters.values() if len(ids) > 1),
+        key=lambda ids: ids[0],
+    )
@@ -0,0 +1,67 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_json(value):
+    """Serialize a value to JSON, using ``orjson`` when it's installed.
+
+    Args:
+        value : A JSON serializable value.
+
+    Returns:
+        The UTF-8 encoded JSON text of the value.
+
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def to_json_line(value):
+    """Serialize a value as a single line of JSON Lines.
+
+    Args:
+        value : A JSON serializable value.
+
+    Returns:
+        The UTF-8 encoded JSON text of the value terminated by a new line.
+
+    """
+    return to_json(value) + b"\n"
+
+
+def stream_json_array(name, values, **fields):
+    """Serialize a JSON object holding an array incrementally, one item at a time.
+
+    Only one item is held in memory at a time, so ``values`` can be read from a server-side cursor.
+
+    Args:
+        name (str) : The name of the array within the object.
+        values (iterable) : The JSON serializable items of the array.
+        **fields : The other attributes of the object, written after the array. A callable is given the number of\
+        items of the array and returns the value of the attribute.
+
+    Yields:
+        Chunks of the UTF-8 encoded JSON text of the object.
+
+    """
+    yield b"{" + to_json(name) + b":["
+
+    count = 0
+    for value in values:
+        if count:
+            yield b"," + to_json(value)
+        else:
+            yield to_json(value)
+        count += 1
+
+    yield b"]"
+    for field_name, value in fields.items():
+        if callable(value):
+            value = value(count)
+        yield b"," + to_json(field_name) + b":" + to_json(value)
+    yield b"}"
@@ -0,0 +1,65 @@
+"""Converts questions.category to an indexed integer foreign key of categories
+
+Revision ID: 4f1c2a9d7b3e
+Revises:
+Create Date: 2026-10-19 19:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a9d7b3e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name']: c for c in inspector.get_columns('questions')}
+
+    # Databases created by ``db.create_all()`` hold the category as text,
+    # while the ones restored from ``trivia.psql`` already hold integers
+    if not isinstance(columns['category']['type'], sa.Integer):
+        op.execute(
+            "UPDATE questions SET category = NULL "
+            "WHERE category !~ '^[0-9]+$'"
+        )
+        op.alter_column('questions', 'category',
+                   existing_type=sa.String(),
+                   type_=sa.Integer(),
+                   postgresql_using='category::integer',
+                   existing_nullable=True)
+
+    # Orphan questions would violate the foreign key below
+    op.execute(
+        "UPDATE questions SET category = NULL "
+        "WHERE category NOT IN (SELECT id FROM categories)"
+    )
+
+    if not inspector.get_foreign_keys('questions'):
+        op.create_foreign_key('questions_category_fkey', 'questions',
+                   'categories', ['category'], ['id'],
+                   onupdate='CASCADE', ondelete='SET NULL')
+
+    indexes = {i['name'] for i in inspector.get_indexes('questions')}
+    if 'ix_questions_category' not in indexes:
+        op.create_index(op.f('ix_questions_category'), 'questions',
+                   ['category'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_questions_category'), table_name='questions')
+
+    inspector = sa.inspect(op.get_bind())
+    for foreign_key in inspector.get_foreign_keys('questions'):
+        op.drop_constraint(foreign_key['name'], 'questions',
+                   type_='foreignkey')
+
+    op.alter_column('questions', 'category',
+               existing_type=sa.Integer(),
+               type_=sa.String(),
+               postgresql_using='category::varchar',
+               existing_nullable=True)
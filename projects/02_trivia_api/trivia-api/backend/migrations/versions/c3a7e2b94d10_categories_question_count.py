@@ -0,0 +1,30 @@
+"""Adds the precomputed question_count column to categories
+
+Revision ID: c3a7e2b94d10
+Revises: 9b6e5d1f0c27
+Create Date: 2026-10-19 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a7e2b94d10'
+down_revision = '9b6e5d1f0c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('categories', sa.Column('question_count', sa.Integer(),
+               server_default='0', nullable=False))
+    op.execute(
+        "UPDATE categories SET question_count = ("
+        "SELECT count(questions.id) FROM questions "
+        "WHERE questions.category = categories.id)"
+    )
+
+
+def downgrade():
+    op.drop_column('categories', 'question_count')
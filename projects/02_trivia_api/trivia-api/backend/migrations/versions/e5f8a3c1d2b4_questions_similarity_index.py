@@ -0,0 +1,32 @@
+"""Adds the text hash and the MinHash signature of questions
+
+Revision ID: e5f8a3c1d2b4
+Revises: c3a7e2b94d10
+Create Date: 2026-10-19 22:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f8a3c1d2b4'
+down_revision = 'c3a7e2b94d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing questions are hashed by ``flask index-questions``
+    op.add_column('questions', sa.Column('text_hash', sa.String(length=40),
+               nullable=True))
+    op.add_column('questions', sa.Column('signature', sa.LargeBinary(),
+               nullable=True))
+    op.create_index(op.f('ix_questions_text_hash'), 'questions',
+               ['text_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_questions_text_hash'), table_name='questions')
+    op.drop_column('questions', 'signature')
+    op.drop_column('questions', 'text_hash')
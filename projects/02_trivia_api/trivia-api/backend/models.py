@@ -1,6 +1,16 @@
 import os
-from sqlalchemy import Column, String, Integer
+from collections import Counter
+
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    ForeignKey,
+    Index,
+    LargeBinary,
+)
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.sql import func
 
 DATABASE_NAME = os.getenv("DB_NAME")
 DATABASE_USER = os.getenv("DB_USER")
@@ -29,24 +39,113 @@ class Question(db.Model):
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(
+        Integer,
+        ForeignKey("categories.id", onupdate="CASCADE", ondelete="SET NULL"),
+        index=True,
+    )
     difficulty = Column(Integer)
+    text_hash = Column(String(40), index=True)
+    signature = Column(LargeBinary)
 
-    def __init__(self, question, answer, category, difficulty):
+    def __init__(
+        self,
+        question,
+        answer,
+        category,
+        difficulty,
+        text_hash=None,
+        signature=None,
+    ):
         self.question = question
         self.answer = answer
         self.category = category
         self.difficulty = difficulty
+        self.text_hash = text_hash
+        self.signature = signature
+
+    @staticmethod
+    def existing_hashes(text_hashes):
+        """Find which text hashes already belong to a question.
+
+        Args:
+            text_hashes (iterable) : The hashes of the normalized text of questions.
+
+        Returns:
+            The set of the hashes that already exist.
+
+        """
+        text_hashes = set(text_hashes)
+        if not text_hashes:
+            return set()
+        return {
+            text_hash
+            for text_hash, in db.session.query(Question.text_hash).filter(
+                Question.text_hash.in_(text_hashes)
+            )
+        }
 
     def insert(self):
         db.session.add(self)
+        Category.count_questions({self.category: 1})
+        db.session.commit()
+
+    @staticmethod
+    def insert_all(questions):
+        """Insert many questions within a single transaction.
+
+        Args:
+            questions (list) : A list of ``Question``.
+
+        """
+        db.session.add_all(questions)
+        Category.count_questions(Counter(q.category for q in questions))
+        db.session.commit()
+
+    @staticmethod
+    def apply_bulk(questions, deleted_ids):
+        """Insert and delete many questions within a single transaction.
+
+        The questions are deleted by a single ``DELETE ... WHERE id IN (...)``.
+
+        Args:
+            questions (list) : A list of ``Question`` to be inserted.
+            deleted_ids (list) : The IDs of the questions to be deleted.
+
+        Returns:
+            The ``(id, category, difficulty)`` rows of the questions that were deleted, IDs that don't exist are\
+            skipped.
+
+        """
+        deleted = []
+        if deleted_ids:
+            deleted = (
+                db.session.query(
+                    Question.id, Question.category, Question.difficulty
+                )
+                .filter(Question.id.in_(deleted_ids))
+                .all()
+            )
+        if deleted:
+            db.session.query(Question).filter(
+                Question.id.in_([row.id for row in deleted])
+            ).delete(synchronize_session=False)
+
+        db.session.add_all(questions)
+
+        deltas = Counter(q.category for q in questions)
+        deltas.subtract(Counter(row.category for row in deleted))
+        Category.count_questions(deltas)
         db.session.commit()
 
+        return deleted
+
     def update(self):
         db.session.commit()
 
     def delete(self):
         db.session.delete(self)
+        Category.count_questions({self.category: -1})
         db.session.commit()
 
     def format(self):
@@ -66,9 +165,108 @@ class Category(db.Model):
 
     id = Column(Integer, primary_key=True)
     type = Column(String)
+    question_count = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
 
     def __init__(self, type):
         self.type = type
 
+    @staticmethod
+    def count_questions(deltas):
+        """Add to the question counters within the current transaction.
+
+        Args:
+            deltas (dict) : The number of questions added, or removed if negative, by category ID.
+
+        """
+        for category_id, delta in deltas.items():
+            if category_id is None or not delta:
+                continue
+            db.session.query(Category).filter(
+                Category.id == category_id
+            ).update(
+                {Category.question_count: Category.question_count + delta},
+                synchronize_session=False,
+            )
+
+    @staticmethod
+    def reconcile_question_counts():
+        """Recount the questions of every category, fixing counters that drifted."""
+        question_count = (
+            db.session.query(func.count(Question.id))
+            .filter(Question.category == Category.id)
+            .correlate(Category)
+            .as_scalar()
+        )
+        db.session.query(Category).update(
+            {Category.question_count: question_count},
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+    def format(self):
+        return {
+            "id": self.id,
+            "type": self.type,
+            "question_count": self.question_count,
+        }
+
+
+class Score(db.Model):
+    """Score model class, the result of a quiz played by a player."""
+
+    __tablename__ = "scores"
+    __table_args__ = (Index("ix_scores_category_player", "category", "player"),)
+
+    id = Column(Integer, primary_key=True)
+    player = Column(String, nullable=False)
+    category = Column(
+        Integer,
+        ForeignKey("categories.id", onupdate="CASCADE", ondelete="CASCADE"),
+    )
+    score = Column(Integer, nullable=False)
+
+    def __init__(self, player, category, score):
+        self.player = player
+        self.category = category
+        self.score = score
+
+    @staticmethod
+    def insert_all(scores):
+        """Insert many scores within a single transaction.
+
+        Args:
+            scores (list) : A list of ``(player, category, score)`` tuples.
+
+        """
+        db.session.bulk_insert_mappings(
+            Score,
+            [
+                {"player": player, "category": category, "score": score}
+                for player, category, score in scores
+            ],
+        )
+        db.session.commit()
+
+    @staticmethod
+    def best_scores():
+        """Query the best score of each player for each category.
+
+        Returns:
+            A list of ``(player, category, score)`` tuples.
+
+        """
+        return (
+            db.session.query(Score.player, Score.category, func.max(Score.score))
+            .group_by(Score.player, Score.category)
+            .all()
+        )
+
     def format(self):
-        return {"id": self.id, "type": self.type}
+        return {
+            "id": self.id,
+            "player": self.player,
+            "category": self.category,
+            "score": self.score,
+        }
@@ -1,36 +1,138 @@
+import asyncio
 import os
 import json
+import re
+import sqlite3
+import time
 import unittest
 
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, exc
 
-from flaskr import create_app, QUESTIONS_PER_PAGE
-from models import setup_db, Question, Category
+from flaskr import create_app, QUESTIONS_PER_PAGE, SEARCH_COST
+from flaskr.asgi import create_asgi_app
+from flaskr.ratelimit import MemoryBackend
+from models import db, Question, Category, Score
 
 DATABASE_NAME = os.getenv("TEST_DB_NAME")
 DATABASE_USER = os.getenv("TEST_DB_USER")
 DATABASE_HOST = os.getenv("TEST_DB_HOST")
 DATABASE_PASSWORD = os.getenv("TEST_DB_PASSWORD")
 
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "trivia.psql")
+RESPONSE_TIME_LIMIT = 0.5
+
+test_config = {}
+
+
+def setUpModule():
+    """Create the test database and load the fixtures once per process.
+
+    Without the ``TEST_DB_*`` variables the tests run against a SQLite database in memory, shared by the apps of
+    every test through a single connection, so each pytest-xdist worker gets its own database.
+    """
+    test_config.update(APIDOCS="disabled", TESTING=True)
+
+    if DATABASE_NAME:
+        test_config["SQLALCHEMY_DATABASE_URI"] = (
+            f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}"
+            f"@{DATABASE_HOST}/{DATABASE_NAME}"
+        )
+    else:
+        # Autocommit mode, the transactions are started by ``begin_transaction``
+        connection = SharedConnection(
+            sqlite3.connect(
+                ":memory:", check_same_thread=False, isolation_level=None
+            )
+        )
+        test_config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        test_config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "creator": lambda: connection
+        }
+
+    app = create_app(test_config)
+    with app.app_context():
+        if not Category.query.count():
+            load_fixtures(db.engine)
+        db.session.remove()
+
+
+class SharedConnection:
+    """Proxy of the SQLite connection shared by every app, which must not be closed along with their engines."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def close(self):
+        pass
+
+
+def load_fixtures(engine, path=FIXTURES_PATH):
+    """Insert the rows of the ``COPY`` blocks of a PostgreSQL dump."""
+    with open(path, encoding="utf-8") as f, engine.begin() as connection:
+        lines = iter(f)
+        for line in lines:
+            match = re.match(r"COPY public\.(\w+) \((.*)\) FROM stdin;", line)
+            if not match:
+                continue
+
+            table = db.metadata.tables[match.group(1)]
+            columns = [c.strip() for c in match.group(2).split(",")]
+            rows = []
+            for row in lines:
+                if row.startswith("\\."):
+                    break
+                values = row.rstrip("\n").split("\t")
+                rows.append(
+                    {
+                        column: None if value == "\\N" else value
+                        for column, value in zip(columns, values)
+                    }
+                )
+            connection.execute(table.insert(), rows)
+
+
+def begin_transaction(connection):
+    """Start the transactions that pysqlite leaves to the autocommit mode, so savepoints work."""
+    connection.execute("BEGIN")
+
+
+def restart_savepoint(session, transaction):
+    """Open a new savepoint once the app commits or rolls back the current one."""
+    if transaction.nested and not transaction._parent.nested:
+        session.expire_all()
+        session.begin_nested()
+
 
 class TriviaTestCase(unittest.TestCase):
     """This class represents the trivia test case"""
 
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
+        """Define test variables and initialize app.
+
+        Each test gets a new app, so the in-memory indexes start empty, and runs inside a transaction that is
+        rolled back afterwards, so the fixtures are loaded only once.
+        """
+        self.app = create_app(test_config)
         self.client = self.app.test_client()
-        self.database_path = f'postgresql://{DATABASE_USER}:\
-            {DATABASE_PASSWORD}@{DATABASE_HOST}/{DATABASE_NAME}'
         # binds the app to the current context
         self.ctx = self.app.app_context()
         self.ctx.push()
-        setup_db(self.app, self.database_path)
 
-        self.db = SQLAlchemy()
-        self.db.init_app(self.app)
-        # create all tables
-        self.db.create_all()
+        engine = db.get_engine()
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "begin", begin_transaction)
+
+        self.connection = engine.connect()
+        self.connection.begin()
+        self.session = db.create_scoped_session(
+            options={"bind": self.connection, "binds": {}}
+        )
+        event.listen(self.session, "after_transaction_end", restart_savepoint)
+        self.session.begin_nested()
+        self.app_session, db.session = db.session, self.session
 
         self.new_question = {
             "question": "In which year the Great Depression started "
@@ -44,10 +146,20 @@ class TriviaTestCase(unittest.TestCase):
 
     def tearDown(self):
         """Executed after reach test"""
-        self.db.session.remove()
-        self.db.drop_all()
+        self.session.remove()
+        db.session = self.app_session
+        # Closing the connection rolls back the transaction of the test
+        self.connection.close()
         self.ctx.pop()
 
+    def assertRespondsWithin(self, seconds, method, url, **kwargs):
+        """Assert the request is answered successfully within the time limit."""
+        started = time.perf_counter()
+        response = self.client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, seconds)
+
     def test_can_get_categories(self):
         """Test API can get all categories"""
         total_of_categories = Category.query.count()
@@ -58,6 +170,39 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(len(data), total_of_categories)
         self.assertTrue(data[0]["id"])
         self.assertTrue(data[0]["type"])
+        self.assertEqual(
+            data[0]["question_count"],
+            Question.query.filter_by(category=data[0]["id"]).count(),
+        )
+
+    def test_can_get_categories_through_asgi(self):
+        """Test API serves the same routes through the ASGI interface"""
+        app = create_asgi_app(test_config)
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "path": "/api/categories",
+            "raw_path": b"/api/categories",
+            "root_path": "",
+            "scheme": "http",
+            "query_string": b"",
+            "headers": [],
+            "client": ("127.0.0.1", 5000),
+            "server": ("localhost", 80),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(app(scope, receive, send))
+        body = b"".join(m.get("body", b"") for m in messages[1:])
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertEqual(len(json.loads(body)), Category.query.count())
 
     def test_405_when_post_categories(self):
         """
@@ -79,7 +224,7 @@ class TriviaTestCase(unittest.TestCase):
         total_of_categories = Category.query.count()
         first_category = Category.query.order_by(Category.type.asc()).first()
         questions = Question.query.filter_by(
-            category=str(first_category.id)
+            category=first_category.id
         ).all()
 
         response = self.client.get("/api/questions")
@@ -97,7 +242,7 @@ class TriviaTestCase(unittest.TestCase):
         total_of_categories = Category.query.count()
         first_category = Category.query.order_by(Category.type.asc()).first()
         questions = Question.query.filter_by(
-            category=str(first_category.id)
+            category=first_category.id
         ).all()
 
         response = self.client.get("/api/questions?page=1")
@@ -127,7 +272,7 @@ class TriviaTestCase(unittest.TestCase):
         Test API can get questions related to specific category
         """
         total_of_categories = Category.query.count()
-        questions = Question.query.filter_by(category="1").all()
+        questions = Question.query.filter_by(category=1).all()
 
         response = self.client.get("/api/categories/1/questions")
         data = json.loads(response.data)
@@ -180,6 +325,10 @@ class TriviaTestCase(unittest.TestCase):
 
         created = Question.query.filter_by(id=data["id"]).first()
         self.assertIsNotNone(created)
+        self.assertEqual(
+            Category.query.get(created.category).question_count,
+            Question.query.filter_by(category=created.category).count(),
+        )
         self.assertEqual(data["question"], created.question)
         self.assertEqual(data["answer"], created.answer)
         self.assertEqual(data["category"], created.category)
@@ -188,7 +337,8 @@ class TriviaTestCase(unittest.TestCase):
     def test_400_when_create_question(self):
         """
         Test API responses with Bad request when trying to create
-        a question without any of required attributes
+        a question without any of required attributes or with an invalid
+        difficulty or category
         """
         new_question = {
             "question": "Which number",
@@ -198,6 +348,17 @@ class TriviaTestCase(unittest.TestCase):
         response = self.client.post("/api/questions", json=new_question)
         self.assertEqual(response.status_code, 400)
 
+        for invalid in (
+            {"difficulty": "hard", "category": "abc"},
+            {"difficulty": 6},
+            {"difficulty": True},
+            {"category": 9999999},
+        ):
+            response = self.client.post(
+                "/api/questions", json=dict(self.new_question, **invalid)
+            )
+            self.assertEqual(response.status_code, 400)
+
         not_created = Question.query.filter_by(
             question=new_question["question"],
             answer=new_question["answer"],
@@ -205,6 +366,163 @@ class TriviaTestCase(unittest.TestCase):
         ).first()
         self.assertIsNone(not_created)
 
+    def test_409_when_create_duplicate_question(self):
+        """
+        Test API responses with 409 Conflict when the same question,
+        ignoring case and punctuation, already exists
+        """
+        response = self.client.post("/api/questions", json=self.new_question)
+        self.assertEqual(response.status_code, 201)
+
+        duplicate = dict(
+            self.new_question,
+            question=self.new_question["question"].upper() + "?",
+        )
+        response = self.client.post("/api/questions", json=duplicate)
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(data["errors"][0]["code"], 409)
+
+    def test_find_duplicate_questions(self):
+        """Test the near-duplicate questions are clustered"""
+        question = Question.query.filter(
+            Question.question.ilike("%optical illusions%")
+        ).first()
+        response = self.client.post(
+            "/api/questions",
+            json=dict(
+                self.new_question,
+                question=question.question.rstrip("?") + " in art?",
+            ),
+        )
+        near_duplicate_id = json.loads(response.data)["id"]
+
+        result = self.app.test_cli_runner().invoke(
+            args=["find-duplicate-questions"]
+        )
+        clusters = [
+            json.loads(line)["ids"] for line in result.output.splitlines()
+        ]
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn(sorted([question.id, near_duplicate_id]), clusters)
+        self.assertEqual(
+            Question.query.filter(Question.text_hash.is_(None)).count(), 0
+        )
+
+    def test_create_questions_batch(self):
+        """
+        Test API can create many questions at once and report the
+        questions that could not be created
+        """
+        lines = [
+            json.dumps(self.new_question),
+            json.dumps({"question": "Which number", "answer": "My answer"}),
+            "not a json",
+            json.dumps(dict(self.new_question, category=9999999)),
+        ]
+        response = self.client.post(
+            "/api/questions:batch",
+            data="\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+        results = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(results), len(lines))
+
+        results = {result["line"]: result for result in results}
+        self.assertEqual(results[1]["code"], 201)
+        self.assertEqual(results[2]["code"], 400)
+        self.assertEqual(results[3]["code"], 400)
+        self.assertEqual(results[4]["code"], 400)
+        self.assertEqual(
+            results[4]["message"], "The category doesn't exist."
+        )
+
+        created = Question.query.filter_by(id=results[1]["id"]).first()
+        self.assertIsNotNone(created)
+        self.assertEqual(created.question, self.new_question["question"])
+
+    def test_export_questions(self):
+        """Test API can export all questions"""
+        total_of_questions = Question.query.count()
+
+        response = self.client.get("/api/questions:export")
+        questions = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual(len(questions), total_of_questions)
+        self.assertTrue(questions[0]["id"])
+        self.assertTrue(questions[0]["question"])
+
+    def test_apply_questions_bulk(self):
+        """Test API can create and delete many questions at once"""
+        total_of_questions = Question.query.count()
+        deleted_id = (
+            Question.query.filter(
+                Question.category != self.new_question["category"]
+            )
+            .first()
+            .id
+        )
+        category = Category.query.get(self.new_question["category"])
+        question_count = category.question_count
+
+        response = self.client.post(
+            "/api/questions:bulk",
+            json={
+                "operations": [
+                    {"op": "create", "question": self.new_question},
+                    {"op": "delete", "id": deleted_id},
+                    {"op": "delete", "id": 9999999},
+                    {"op": "create", "question": {"question": "Incomplete"}},
+                    {"op": "create", "question": self.new_question},
+                    {"op": "delete", "id": deleted_id},
+                    {
+                        "op": "create",
+                        "question": dict(
+                            self.new_question,
+                            question="Unknown category",
+                            category=9999999,
+                        ),
+                    },
+                ]
+            },
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r["code"] for r in data["results"]],
+            [201, 200, 404, 400, 409, 200, 400],
+        )
+        self.assertEqual(data["results"][1]["id"], deleted_id)
+        self.assertEqual(data["results"][5]["id"], deleted_id)
+        self.assertTrue(data["results"][5]["duplicate"])
+        self.assertEqual(
+            data["results"][6]["message"], "The category doesn't exist."
+        )
+        self.assertEqual(Question.query.count(), total_of_questions)
+        self.assertIsNone(Question.query.get(deleted_id))
+        self.assertIsNotNone(Question.query.get(data["results"][0]["id"]))
+
+        db.session.refresh(category)
+        self.assertEqual(
+            category.question_count,
+            Question.query.filter_by(category=category.id).count(),
+        )
+        self.assertGreater(category.question_count, question_count)
+
+    def test_400_when_apply_questions_bulk(self):
+        """
+        Test API responses with 400 Bad Request when the bulk body
+        is not a list of operations
+        """
+        response = self.client.post(
+            "/api/questions:bulk", json={"operations": {"op": "create"}}
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data["errors"][0]["code"], 400)
+
     def test_search_question(self):
         """Test API can search for questions by a term"""
         questions = Question.query.filter(
@@ -238,6 +556,30 @@ class TriviaTestCase(unittest.TestCase):
         self.assertFalse(data["current_category"])
         self.assertFalse(data["total_questions"])
 
+    def test_search_questions_streamed(self):
+        """Test API can stream every question matching a term"""
+        questions = (
+            Question.query.filter(Question.question.ilike("%e%"))
+            .order_by(Question.id)
+            .all()
+        )
+        results = [q.format() for q in questions]
+
+        response = self.client.get("/api/questions?q=e&stream=true")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertGreater(len(results), QUESTIONS_PER_PAGE)
+        self.assertListEqual(data["questions"], results)
+        self.assertEqual(data["total_questions"], len(results))
+        self.assertEqual(data["current_category"], 0)
+
+        response = self.client.get("/api/questions?q=lieutenant&stream=true")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["questions"], [])
+        self.assertEqual(data["total_questions"], 0)
+
     def test_400_when_search_questions_with_empty_term(self):
         """
         Test API responses with 400 Bad Request when no query term
@@ -290,8 +632,11 @@ class TriviaTestCase(unittest.TestCase):
         """
         category = 4
         self.game["quiz_category"] = {"id": category}
+        total_of_questions = Question.query.filter_by(
+            category=category
+        ).count()
 
-        for _ in range(5):
+        for _ in range(total_of_questions):
             response = self.client.post("/api/quizzes", json=self.game)
             data = json.loads(response.data)
             self.assertEqual(response.status_code, 200)
@@ -308,6 +653,375 @@ class TriviaTestCase(unittest.TestCase):
 
             self.game["previous_questions"].append(data["question"]["id"])
 
+    def test_play_adaptive_game(self):
+        """
+        Test API can play the quiz choosing questions by the accuracy
+        of the player
+        """
+        category = 4
+        self.game["quiz_category"] = {"id": category}
+        self.game["adaptive"] = True
+        self.game["correct_answers"] = 0
+        total_of_questions = Question.query.filter_by(
+            category=category
+        ).count()
+
+        for _ in range(total_of_questions):
+            response = self.client.post("/api/quizzes", json=self.game)
+            data = json.loads(response.data)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(data["question"]["category"], category)
+            self.assertEqual(data["quiz_category"]["id"], category)
+            self.assertNotIn(
+                data["question"]["id"], self.game["previous_questions"]
+            )
+
+            self.game["previous_questions"].append(data["question"]["id"])
+            self.game["correct_answers"] += 1
+
+    def test_play_game_bundle(self):
+        """Test API returns the next unplayed questions of a quiz at once"""
+        category = Category.query.filter(Category.question_count > 2).first()
+        played = Question.query.filter_by(category=category.id).first()
+
+        response = self.client.post(
+            "/api/quizzes",
+            json={
+                "quiz_category": {"id": category.id},
+                "previous_questions": [played.id],
+                "bundle_size": 2,
+                "withhold_answers": True,
+            },
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data["questions"]), 2)
+        self.assertNotIn(played.id, [q["id"] for q in data["questions"]])
+        for question in data["questions"]:
+            self.assertEqual(question["category"], category.id)
+            self.assertNotIn("answer", question)
+        self.assertEqual(data["categories"], [category.format()])
+
+        response = self.client.post(
+            "/api/quizzes",
+            json={"previous_questions": [], "adaptive": True, "bundle_size": 3},
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data["questions"]), 3)
+        self.assertEqual(len({q["id"] for q in data["questions"]}), 3)
+        self.assertTrue(data["questions"][0]["answer"])
+
+    def test_400_when_play_game_bundle(self):
+        """
+        Test API responses with 400 Bad Request when the bundle size
+        is out of range
+        """
+        response = self.client.post(
+            "/api/quizzes", json={"previous_questions": [], "bundle_size": 0}
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data["errors"][0]["code"], 400)
+
+    def test_400_when_play_adaptive_game(self):
+        """
+        Test API responses with 400 Bad Request when the number of correct
+        answers or the previous questions are invalid
+        """
+        for correct_answers in ("x", True, -1, 2):
+            response = self.client.post(
+                "/api/quizzes",
+                json={
+                    "previous_questions": [1],
+                    "adaptive": True,
+                    "correct_answers": correct_answers,
+                },
+            )
+            data = json.loads(response.data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(data["errors"][0]["code"], 400)
+
+        for previous_question in ([1], {"id": 1}, "1", True):
+            response = self.client.post(
+                "/api/quizzes",
+                json={
+                    "previous_questions": [previous_question],
+                    "adaptive": True,
+                    "correct_answers": 1,
+                },
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_play_adaptive_game_with_questions_of_other_workers(self):
+        """
+        Test API chooses the questions added by other worker processes
+        once the difficulty index reloads
+        """
+        other_app = create_app(dict(test_config, RATE_LIMIT_ENABLED=False))
+        difficulty_index = other_app.extensions["difficulty_index"]
+        category = self.new_question["category"]
+        played = {
+            question.id
+            for question in Question.query.filter_by(category=category)
+        }
+        self.assertIsNone(difficulty_index.choose(category, 0.5, played))
+
+        response = self.client.post("/api/questions", json=self.new_question)
+        self.assertEqual(response.status_code, 201)
+        created_id = json.loads(response.data)["id"]
+        self.assertIsNone(difficulty_index.choose(category, 0.5, played))
+
+        # Run by the scheduled thread every QUIZ_INDEX_RELOAD_INTERVAL
+        difficulty_index.reload()
+        self.assertEqual(
+            difficulty_index.choose(category, 0.5, played), created_id
+        )
+
+    def test_check_quiz_answers(self):
+        """Test API can check the answers of questions"""
+        question = Question.query.first()
+
+        response = self.client.post(
+            "/api/quizzes/answers",
+            json={
+                "answers": [
+                    {"id": question.id, "answer": question.answer.upper()},
+                    {"id": question.id, "answer": "Wrong"},
+                    {"id": 9999999, "answer": "Unknown"},
+                ]
+            },
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r["correct"] for r in data["results"]], [True, False, False]
+        )
+        self.assertEqual(data["results"][0]["answer"], question.answer)
+        self.assertIsNone(data["results"][2]["answer"])
+
+    def test_add_score_and_get_leaderboard(self):
+        """
+        Test API can record scores and rank the players of a category
+        """
+        category = 4
+        for player, score in [("Maya", 3), ("Ali", 5), ("Maya", 4)]:
+            response = self.client.post(
+                "/api/scores",
+                json={
+                    "player": player,
+                    "quiz_category": {"id": category},
+                    "score": score,
+                },
+            )
+            self.assertEqual(response.status_code, 201)
+
+        response = self.client.get(f"/api/leaderboard?category={category}")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["category"], category)
+        self.assertGreaterEqual(len(data["scores"]), 2)
+
+        response = self.client.get(f"/api/leaderboard/Maya?category={category}")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["score"], 4)
+        self.assertTrue(data["rank"])
+
+    def test_add_score_is_persisted_and_reloaded(self):
+        """
+        Test API writes the scores to the database and ranks the scores
+        recorded by other worker processes once the leaderboard reloads
+        """
+        app = create_app(
+            dict(test_config, LEADERBOARD_BATCH_SIZE=1, RATE_LIMIT_ENABLED=False)
+        )
+        other_app = create_app(dict(test_config, RATE_LIMIT_ENABLED=False))
+        other_client = other_app.test_client()
+        url = "/api/leaderboard/Persisted?category=4"
+        self.assertEqual(other_client.get(url).status_code, 404)
+
+        response = app.test_client().post(
+            "/api/scores",
+            json={
+                "player": "Persisted",
+                "quiz_category": {"id": 4},
+                "score": 7,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [
+                (s.category, s.score)
+                for s in Score.query.filter_by(player="Persisted")
+            ],
+            [(4, 7)],
+        )
+        self.assertEqual(other_client.get(url).status_code, 404)
+
+        # Run by the scheduled thread every LEADERBOARD_RELOAD_INTERVAL
+        other_app.extensions["leaderboard"].reload()
+        response = other_client.get(url)
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["score"], 7)
+
+    def test_400_when_add_score(self):
+        """
+        Test API responses with 400 Bad Request when recording a score
+        without the player or with a body or a category that is not an object
+        """
+        response = self.client.post("/api/scores", json={"score": 3})
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data["errors"][0]["code"], 400)
+
+        response = self.client.post(
+            "/api/scores",
+            json={"player": "Maya", "quiz_category": [4], "score": 3},
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/scores", json=[{"player": "Maya"}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_404_when_get_player_rank(self):
+        """
+        Test API responses with 404 Not Found when requesting the rank
+        of a player without scores
+        """
+        response = self.client.get("/api/leaderboard/nobody?category=9999999")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data["errors"][0]["code"], 404)
+
+    def test_429_when_search_questions_too_often(self):
+        """
+        Test API responses with 429 Too Many Requests when a client
+        searches for questions faster than its rate limit
+        """
+        app = create_app(
+            dict(
+                test_config,
+                RATE_LIMITS={"get_questions": (0.01, 10)},
+                RATE_LIMIT_API_KEYS={"editor"},
+                TRUSTED_PROXIES=1,
+            )
+        )
+        client = app.test_client()
+
+        for _ in range(10 // SEARCH_COST):
+            response = client.get(f"/api/questions?q={self.search_question}")
+            self.assertEqual(response.status_code, 200)
+
+        response = client.get(f"/api/questions?q={self.search_question}")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(data["errors"][0]["code"], 429)
+        self.assertGreater(int(response.headers["Retry-After"]), 0)
+
+        response = client.get(
+            f"/api/questions?q={self.search_question}",
+            headers={"X-API-Key": "unknown"},
+        )
+        self.assertEqual(response.status_code, 429)
+
+        response = client.get(
+            f"/api/questions?q={self.search_question}",
+            headers={"X-API-Key": "editor"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = client.get(
+            f"/api/questions?q={self.search_question}",
+            headers={"X-Forwarded-For": "203.0.113.7"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = client.get("/api/rate-limits")
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            data["get_questions"],
+            {"allowed": 10 // SEARCH_COST + 2, "limited": 2},
+        )
+
+    def test_rate_limit_buckets_are_pruned_once_full_again(self):
+        """Test the buckets kept in memory are forgotten only once they would be full again"""
+        backend = MemoryBackend()
+        backend.consume("slow", 0.01, 10)
+        backend.consume("fast", 10, 10)
+
+        backend._prune(time.monotonic() + 60)
+        self.assertEqual(set(backend.buckets), {"slow"})
+
+        backend._prune(time.monotonic() + 1000)
+        self.assertEqual(backend.buckets, {})
+
+    def test_get_metrics(self):
+        """Test API exposes its metrics in the Prometheus text format"""
+        self.client.get(f"/api/questions?q={self.search_question}")
+        self.client.post("/api/quizzes", json=self.game)
+
+        response = self.client.get("/metrics")
+        metrics = response.data.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn(
+            'trivia_http_requests_total{endpoint="get_questions",'
+            'method="GET",status="200"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'trivia_http_request_duration_seconds_count'
+            '{endpoint="play_game"} 1',
+            metrics,
+        )
+        self.assertRegex(
+            metrics, r'trivia_db_queries_total\{endpoint="get_questions"\} \d+'
+        )
+        self.assertIn('trivia_quiz_turns_total{mode="classic"} 1', metrics)
+        self.assertIn("trivia_search_hits_count 1", metrics)
+        self.assertIn(
+            'trivia_rate_limit_requests_total{endpoint="play_game",'
+            'decision="allowed"} 1',
+            metrics,
+        )
+
+    def test_failed_query_metrics(self):
+        """Test the start time of a failed query isn't kept on its connection"""
+        savepoint = self.connection.begin_nested()
+        with self.assertRaises(exc.DBAPIError):
+            self.connection.execute("SELECT * FROM missing_table")
+        savepoint.rollback()
+
+        self.assertNotIn("metrics_query_start", self.connection.info)
+        self.connection.execute("SELECT 1")
+        self.assertNotIn("metrics_query_start", self.connection.info)
+
+    def test_questions_response_time(self):
+        """Test API lists questions within the time limit"""
+        self.assertRespondsWithin(RESPONSE_TIME_LIMIT, "GET", "/api/questions")
+        self.assertRespondsWithin(
+            RESPONSE_TIME_LIMIT, "GET", "/api/categories/1/questions"
+        )
+
+    def test_search_response_time(self):
+        """Test API searches questions within the time limit"""
+        self.assertRespondsWithin(
+            RESPONSE_TIME_LIMIT, "GET", f"/api/questions?q={self.search_question}"
+        )
+
+    def test_quiz_response_time(self):
+        """Test API gets the next question of a quiz within the time limit"""
+        self.assertRespondsWithin(
+            RESPONSE_TIME_LIMIT, "POST", "/api/quizzes", json=self.game
+        )
+        self.game["adaptive"] = True
+        self.assertRespondsWithin(
+            RESPONSE_TIME_LIMIT, "POST", "/api/quizzes", json=self.game
+        )
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
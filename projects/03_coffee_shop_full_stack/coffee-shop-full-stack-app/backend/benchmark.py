@@ -0,0 +1,253 @@
+"""
+    benchmark.py
+    ------------
+
+    This module measures the write throughput of the Coffee Shop storage
+    layer with concurrent worker processes, the way several gunicorn workers
+    share the database.
+
+    Each worker process creates drinks, updates their title and recipe and
+    deletes some of them for a while, then the throughput, the latency
+    percentiles and the errors, e.g. "database is locked", of every number of
+    workers are reported as JSON.
+
+    Usage:
+        python benchmark.py --workers 1 2 4 8 --duration 10
+        python benchmark.py --workers 4 --journal-mode delete
+        python benchmark.py --database-url postgresql://localhost/coffee_bench
+
+    The database is a temporary SQLite file unless ``--database-url`` is
+    given, the drinks created by the benchmark are deleted at the end.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+PERCENTILES = (50, 95, 99)
+RECIPE = [
+    {"color": "#44240C", "name": "1 part hot strong coffee", "parts": 1},
+    {"color": "#F3F4FC", "name": "1 part steamed milk", "parts": 1},
+]
+
+
+def run_worker(worker_id, prefix, deadline, results):
+    """Write drinks until the deadline and send the measures back.
+
+    The app is imported by the worker itself, so every worker process owns
+    its engine and connections.
+
+    :param worker_id: The number of the worker.
+    :param prefix: The prefix of the titles of the drinks of this run.
+    :param deadline: The ``time.time()`` when to stop.
+    :param results: The queue receiving the measures.
+    """
+    latencies = []
+    errors = {}
+
+    def count_error(exc):
+        name = f"{type(exc).__name__}: {str(exc).splitlines()[0]}"
+        errors[name] = errors.get(name, 0) + 1
+
+    try:
+        from src.api import app
+        from src.database.data_manager import DrinkDataManager
+        from src.database.models import db
+
+        with app.app_context():
+            count = 0
+            while time.time() < deadline:
+                count += 1
+                title = f"{prefix}-{worker_id}-{count}"
+                started = time.perf_counter()
+                try:
+                    drink = DrinkDataManager.create_drink(
+                        {"title": title, "recipe": RECIPE}
+                    )
+                    drink = DrinkDataManager.update_drink(
+                        drink["id"],
+                        {
+                            "title": f"{title}-updated",
+                            "recipe": RECIPE[::-1],
+                            "version": drink["version"],
+                        },
+                    )
+                    if count % 4 == 0:
+                        DrinkDataManager.delete_drink(drink["id"])
+                except Exception as exc:
+                    db.session.rollback()
+                    count_error(exc)
+                    continue
+                latencies.append(time.perf_counter() - started)
+    except Exception as exc:
+        count_error(exc)
+    finally:
+        results.put((latencies, errors))
+
+
+def percentile(sorted_values, p):
+    """Get a percentile of sorted values by the nearest rank method.
+
+    :param sorted_values: The sorted list of values.
+    :param p: The percentile, between 0 and 100.
+    :return: The value or ``None`` if there are no values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_workers(workers, duration, prefix):
+    """Run concurrent worker processes and summarize their measures.
+
+    :param workers: The number of worker processes.
+    :param duration: The number of seconds the workers write.
+    :param prefix: The prefix of the titles of the drinks of this run.
+    :return: A dict with the throughput, latencies and errors.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Leave the workers time to start before measuring
+    deadline = time.time() + 2 + duration
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(worker_id, f"{prefix}-{workers}", deadline, results),
+        )
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    latencies = []
+    errors = {}
+    for _ in processes:
+        worker_latencies, worker_errors = results.get()
+        latencies.extend(worker_latencies)
+        for name, count in worker_errors.items():
+            errors[name] = errors.get(name, 0) + count
+    for process in processes:
+        process.join()
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "writes": len(latencies),
+        "writes_per_second": round(len(latencies) / duration, 1),
+        "latency_ms": {
+            f"p{p}": round(percentile(latencies, p) * 1000, 2)
+            if latencies
+            else None
+            for p in PERCENTILES
+        },
+        "errors": errors,
+    }
+
+
+def delete_drinks(prefix):
+    """Delete the drinks created by a run of the benchmark.
+
+    :param prefix: The prefix of the titles of the drinks of the run.
+    """
+    from src.api import app
+    from src.database.models import db, Drink
+
+    with app.app_context():
+        for drink in Drink.query.filter(Drink.title.startswith(prefix)):
+            db.session.delete(drink)
+        db.session.commit()
+
+
+def run(args):
+    """Run the benchmark for every number of workers.
+
+    :param args: The parsed command line arguments.
+    :return: The report dict.
+    """
+    directory = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        directory = tempfile.mkdtemp(prefix="coffee-benchmark-")
+        os.environ["DATABASE_URL"] = "sqlite:///{}".format(
+            os.path.join(directory, "benchmark.db")
+        )
+    os.environ["SQLITE_JOURNAL_MODE"] = args.journal_mode
+    os.environ["SQLITE_SYNCHRONOUS"] = args.synchronous
+
+    # Create the tables once, before the workers race to do it
+    import src.api  # noqa: F401
+
+    prefix = f"benchmark-{uuid.uuid4().hex[:8]}"
+    report = {
+        "database_url": os.environ["DATABASE_URL"],
+        "journal_mode": args.journal_mode,
+        "synchronous": args.synchronous,
+        "duration": args.duration,
+        "runs": [],
+    }
+    try:
+        for workers in args.workers:
+            result = run_workers(workers, args.duration, prefix)
+            print(json.dumps(result))
+            report["runs"].append(result)
+    finally:
+        delete_drinks(prefix)
+        if directory:
+            shutil.rmtree(directory)
+
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the write throughput of the Coffee Shop "
+        "storage layer with concurrent worker processes."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="The numbers of worker processes to compare.",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10,
+        help="The number of seconds each run writes.",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="The URL of a scratch database, a temporary SQLite file by "
+        "default.",
+    )
+    parser.add_argument(
+        "--journal-mode",
+        default="wal",
+        help="The SQLite journal mode, e.g. delete to compare with the "
+        "default of SQLite.",
+    )
+    parser.add_argument(
+        "--synchronous", default="normal", help="The SQLite synchronous mode."
+    )
+    parser.add_argument(
+        "--output",
+        default="benchmark.json",
+        help="The file the JSON report is written to.",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    with open(arguments.output, "w") as output:
+        json.dump(run(arguments), output, indent=2)
@@ -0,0 +1,473 @@
+"""
+    load_test.py
+    ------------
+
+    This module load tests the Coffee Shop API offline, with a local
+    stand-in of the Auth0 key set.
+
+    It generates an RSA key pair, serves its JSON Web Key Set locally, mints
+    tokens with the given permissions, seeds a temporary database with
+    drinks and serves the API from a local server. Concurrent clients then
+    drive ``GET /drinks``, ``GET /drinks-detail``, ``POST /drinks``,
+    ``PATCH /drinks/<id>`` and ``DELETE /drinks/<id>``, and the latency
+    percentiles, the throughput and the status codes of each endpoint are
+    reported as JSON.
+
+    Usage:
+        python load_test.py --clients 20 --duration 30 --drinks 200
+        python load_test.py --tokens 1000 --permissions get:drinks-detail
+        python load_test.py --etag --output load_test.json
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import argparse
+import base64
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+PERCENTILES = (50, 95, 99)
+KEY_ID = "load-test"
+PERMISSIONS = [
+    "get:drinks-detail",
+    "post:drinks",
+    "patch:drinks",
+    "delete:drinks",
+]
+# The share of each endpoint in the requests of a client
+SCENARIO = {
+    "get_drinks": 50,
+    "get_drinks_detail": 25,
+    "post_drink": 10,
+    "patch_drink": 10,
+    "delete_drink": 5,
+}
+COLORS = ["#44240C", "#F3F4FC", "#9D6947", "#C8EBFC", "#85583C", "#EDE1D9"]
+
+
+def base64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def generate_key_pair():
+    """Generate an RSA key pair to sign the tokens.
+
+    :return: A tuple with the PEM of the private key and the JSON Web Key
+     Set of the public key.
+    """
+    try:
+        from Crypto.PublicKey import RSA
+
+        key = RSA.generate(2048)
+        private_pem = key.exportKey("PEM").decode("ascii")
+        modulus, exponent = key.n, key.e
+    except ImportError:
+        import rsa
+
+        public_key, private_key = rsa.newkeys(2048)
+        private_pem = private_key.save_pkcs1().decode("ascii")
+        modulus, exponent = public_key.n, public_key.e
+
+    jwks = {
+        "keys": [
+            {
+                "kty": "RSA",
+                "use": "sig",
+                "alg": "RS256",
+                "kid": KEY_ID,
+                "n": base64url_uint(modulus),
+                "e": base64url_uint(exponent),
+            }
+        ]
+    }
+    return private_pem, jwks
+
+
+def mint_token(private_pem, permissions, subject, ttl=3600):
+    """Mint a token like the ones issued by Auth0 for the API.
+
+    :param private_pem: The PEM of the private key.
+    :param permissions: The list of permission strs of the token.
+    :param subject: The subject of the token.
+    :param ttl: The number of seconds the token is valid.
+    :return: The JWT token.
+    """
+    from jose import jwt
+
+    from src.auth.auth import API_AUDIENCE, AUTH0_DOMAIN
+
+    now = int(time.time())
+    claims = {
+        "iss": f"https://{AUTH0_DOMAIN}/",
+        "sub": subject,
+        "aud": API_AUDIENCE,
+        "iat": now,
+        "exp": now + ttl,
+        "permissions": permissions,
+    }
+    return jwt.encode(
+        claims, private_pem, algorithm="RS256", headers={"kid": KEY_ID}
+    )
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve_jwks(directory, jwks):
+    """Serve a JSON Web Key Set from a local server.
+
+    :param directory: The directory the key set is written to.
+    :param jwks: The JSON Web Key Set.
+    :return: A tuple with the server and the URL of the key set.
+    """
+    with open(os.path.join(directory, "jwks.json"), "w") as jwks_file:
+        json.dump(jwks, jwks_file)
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def end_headers(self):
+            self.send_header("Cache-Control", "max-age=600")
+            super().end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/jwks.json".format(server.server_address[1])
+    return server, url
+
+
+def generate_recipe(generator):
+    return [
+        {
+            "color": generator.choice(COLORS),
+            "name": f"{generator.randint(1, 4)} part ingredient {i}",
+            "parts": generator.randint(1, 4),
+        }
+        for i in range(generator.randint(1, 4))
+    ]
+
+
+def seed_drinks(count, generator):
+    """Replace the drinks of the database with generated ones.
+
+    :param count: The number of drinks.
+    :param generator: The random generator.
+    """
+    from src.api import app
+    from src.database.data_manager import DrinkDataManager
+    from src.database.models import db, Drink
+
+    with app.app_context():
+        for drink in Drink.query.all():
+            db.session.delete(drink)
+        db.session.commit()
+        if count:
+            DrinkDataManager.import_drinks(
+                [
+                    {
+                        "title": f"Drink {i}",
+                        "recipe": generate_recipe(generator),
+                    }
+                    for i in range(count)
+                ]
+            )
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Client(threading.Thread):
+    """Sends the requests of the scenario until the deadline.
+
+    :ivar samples: The list of ``(endpoint, status, seconds)`` tuples.
+    """
+
+    def __init__(self, client_id, base_url, tokens, deadline, use_etag, seed):
+        super().__init__(daemon=True)
+        self.client_id = client_id
+        self.base_url = base_url
+        self.tokens = tokens
+        self.deadline = deadline
+        self.use_etag = use_etag
+        self.generator = random.Random(seed)
+        self.etag = None
+        self.created = []
+        self.count = 0
+        self.samples = []
+
+    def request(self, endpoint, method, path, body=None, token=True):
+        headers = {}
+        if token:
+            token = self.generator.choice(self.tokens)
+            headers["Authorization"] = f"Bearer {token}"
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(body).encode("utf-8")
+        if endpoint == "get_drinks" and self.use_etag and self.etag:
+            headers["If-None-Match"] = self.etag
+
+        request = urllib.request.Request(
+            self.base_url + path, data=body, headers=headers, method=method
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status = response.status
+                data = response.read()
+                etag = response.headers.get("ETag")
+        except urllib.error.HTTPError as error:
+            status, data, etag = error.code, error.read(), None
+        except OSError:
+            status, data, etag = 0, b"", None
+        self.samples.append((endpoint, status, time.perf_counter() - started))
+
+        if endpoint == "get_drinks" and etag:
+            self.etag = etag
+        if status == 200 and data:
+            return json.loads(data)
+        return None
+
+    def run(self):
+        endpoints = list(SCENARIO)
+        weights = list(SCENARIO.values())
+        while time.time() < self.deadline:
+            endpoint = self.generator.choices(endpoints, weights)[0]
+            # Only the drinks created by this client are updated or deleted
+            if not self.created and endpoint in (
+                    "patch_drink", "delete_drink"
+            ):
+                endpoint = "post_drink"
+            getattr(self, endpoint)()
+
+    def get_drinks(self):
+        self.request("get_drinks", "GET", "/drinks", token=False)
+
+    def get_drinks_detail(self):
+        self.request("get_drinks_detail", "GET", "/drinks-detail")
+
+    def post_drink(self):
+        self.count += 1
+        result = self.request(
+            "post_drink",
+            "POST",
+            "/drinks",
+            {
+                "title": f"Client {self.client_id} drink {self.count}",
+                "recipe": generate_recipe(self.generator),
+            },
+        )
+        if result:
+            drink = result["drinks"][0]
+            self.created.append((drink["id"], drink["version"]))
+
+    def patch_drink(self):
+        index = self.generator.randrange(len(self.created))
+        drink_id, version = self.created[index]
+        result = self.request(
+            "patch_drink",
+            "PATCH",
+            f"/drinks/{drink_id}",
+            {"recipe": generate_recipe(self.generator), "version": version},
+        )
+        if result:
+            self.created[index] = (drink_id, result["drinks"][0]["version"])
+
+    def delete_drink(self):
+        drink_id, _ = self.created.pop(
+            self.generator.randrange(len(self.created))
+        )
+        self.request("delete_drink", "DELETE", f"/drinks/{drink_id}")
+
+
+def percentile(sorted_values, p):
+    """Get a percentile of sorted values by the nearest rank method.
+
+    :param sorted_values: The sorted list of values.
+    :param p: The percentile, between 0 and 100.
+    :return: The value or ``None`` if there are no values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Summarize the samples of every client by endpoint.
+
+    :param samples: The list of ``(endpoint, status, seconds)`` tuples.
+    :param elapsed: The number of seconds the clients ran.
+    :return: A dict with the report of each endpoint and of all of them.
+    """
+    by_endpoint = {"all": []}
+    for endpoint, status, seconds in samples:
+        by_endpoint.setdefault(endpoint, []).append((status, seconds))
+        by_endpoint["all"].append((status, seconds))
+
+    report = {}
+    for endpoint, endpoint_samples in by_endpoint.items():
+        latencies = sorted(seconds for _, seconds in endpoint_samples)
+        statuses = {}
+        for status, _ in endpoint_samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report[endpoint] = {
+            "requests": len(endpoint_samples),
+            "requests_per_second": round(len(endpoint_samples) / elapsed, 1),
+            "latency_ms": {
+                f"p{p}": round(percentile(latencies, p) * 1000, 2)
+                if latencies
+                else None
+                for p in PERCENTILES
+            },
+            "statuses": statuses,
+        }
+    return report
+
+
+def run(args):
+    """Set up the stand-ins, run the clients and report.
+
+    :param args: The parsed command line arguments.
+    :return: The report dict.
+    """
+    generator = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="coffee-load-test-")
+
+    private_pem, jwks = generate_key_pair()
+    jwks_server, jwks_url = serve_jwks(directory, jwks)
+
+    # The app reads its settings when imported
+    os.environ["JWKS_URL"] = jwks_url
+    os.environ["DATABASE_URL"] = "sqlite:///{}".format(
+        os.path.join(directory, "load_test.db")
+    )
+    from src.api import app
+
+    tokens = [
+        mint_token(private_pem, args.permissions, f"load-test|{i}")
+        for i in range(args.tokens)
+    ]
+    seed_drinks(args.drinks, generator)
+
+    server = make_server(
+        args.host,
+        0,
+        app,
+        threaded=True,
+        request_handler=QuietRequestHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{args.host}:{server.server_port}"
+
+    try:
+        started = time.time()
+        clients = [
+            Client(
+                client_id,
+                base_url,
+                tokens,
+                started + args.duration,
+                args.etag,
+                generator.random(),
+            )
+            for client_id in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.time() - started
+    finally:
+        server.shutdown()
+        jwks_server.shutdown()
+        shutil.rmtree(directory)
+
+    samples = [sample for client in clients for sample in client.samples]
+    return {
+        "clients": args.clients,
+        "duration": round(elapsed, 2),
+        "drinks": args.drinks,
+        "tokens": args.tokens,
+        "permissions": args.permissions,
+        "etag": args.etag,
+        "endpoints": summarize(samples, elapsed),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load test the Coffee Shop API offline with a local "
+        "stand-in of the Auth0 key set."
+    )
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=10,
+        help="The number of concurrent clients.",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10,
+        help="The number of seconds the clients send requests.",
+    )
+    parser.add_argument(
+        "--drinks",
+        type=int,
+        default=100,
+        help="The number of drinks seeded in the database.",
+    )
+    parser.add_argument(
+        "--tokens",
+        type=int,
+        default=10,
+        help="The number of distinct tokens the clients pick from, a large "
+        "number defeats the cache of the verified tokens.",
+    )
+    parser.add_argument(
+        "--permissions",
+        nargs="*",
+        default=PERMISSIONS,
+        help="The permissions of the minted tokens.",
+    )
+    parser.add_argument(
+        "--etag",
+        action="store_true",
+        help="Poll GET /drinks with the ETag of the last response, like the "
+        "customer displays.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        default="load_test.json",
+        help="The file the JSON report is written to.",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    report = run(arguments)
+    print(json.dumps(report["endpoints"]["all"]))
+    with open(arguments.output, "w") as output:
+        json.dump(report, output, indent=2)
@@ -1,17 +1,59 @@
 CREATE TABLE IF NOT EXISTS [drinks] (
 [id] INT NULL,
 [title] VARCHAR NULL,
-[recipe] VARCHAR NULL
+[version] INT NULL
+);
+
+CREATE TABLE IF NOT EXISTS [ingredients] (
+[id] INT NULL,
+[drink_id] INT NULL,
+[position] INT NULL,
+[name] VARCHAR NULL,
+[color] VARCHAR NULL,
+[parts] INT NULL
 );
 
 INSERT INTO drinks VALUES
-(1,'French Cafe au Lait Recipe','[{"name": "1 part hot strong coffee (French roast)", "color": "#44240C", "parts": 1}, {"name": "1 part steamed milk", "color": "#F3F4FC", "parts": 1}]'),
-(2,'Pour-Over Coffee','[{"name": "2/3 ounce/18 grams coffee (medium-fine grind)", "color": "#9D6947", "parts": 1}, {"name": "10 ounces/300mL filtered, distilled, or spring water", "color": "#C8EBFC", "parts": 1}]'),
-(3,'Cuban Coffee (Cafecito)','[{"name": "1/4 to 1/2 cup coffee (finely ground; or amount needed for pot)", "color": "#85583C", "parts": 1}, {"name": "1 1/2 cups water (or amount for coffee pot)", "color": "#E4F4FB", "parts": 2}, {"name": "1/4 cup white granulated sugar", "color": "#EDE1D9", "parts": 1}]'),
-(4,'The Perfect Cappuccino','[{"name": "2 shots (a double shot)", "color": "#BB301B", "parts": 2}, {"name": "4 ounces milk", "color": "#C3CCF4", "parts": 4}]'),
-(5,'New Orleans Coffee','[{"name": "4 tablespoons drip-ground coffee", "color": "#C2802F", "parts": 1}, {"name": "2 tablespoons chicory", "color": "#D6E551", "parts": 1}, {"name": "Optional: 1/4 teaspoon salt", "color": "#0B1B3F", "parts": 1}, {"name": "4 cups filtered water", "color": "#A0B8DD", "parts": 1}]'),
-(6,'Cold Brew Coffee','[{"name": "1 cup coffee (coarsely ground)", "color": "#593827", "parts": 1}, {"name": "4 cups filtered or distilled water", "color": "#C8EBFC", "parts": 4}]'),
-(7,'Affogato','[{"name": "1 scoop vanilla gelato (or ice cream)", "color": "#FCFAF2", "parts": 1}, {"name": "2 ounces hot espresso (or strongly hot brewed coffee)", "color": "#AC0A10", "parts": 1}, {"name": "1 piece chocolate (grated)", "color": "#A88C69", "parts": 1}]'),
-(8,'Copycat Maple Pecan Latte','[{"name": "1/4 cup maple syrup", "color": "#F20F28", "parts": 1}, {"name": "1/4 cup pecan butter", "color": "#408BBD", "parts": 1}, {"name": "2 tablespoons brown sugar", "color": "#EDE1D9", "parts": 1}, {"name": "1/2 tablespoon butter", "color": "#BC9B4A", "parts": 1}, {"name": "1/3 cup heavy cream", "color": "#D18C98", "parts": 1}]'),
-(9,'White Chocolate Mocha','[{"name": "3/4 cup milk (whole or low-fat)", "color": "#2444B9", "parts": 1}, {"name": "3 tablespoons white chocolate chips", "color": "#A88C69", "parts": 1}, {"name": "1/2 cup prepared coffee", "color": "#593827", "parts": 1}]'),
-(10,'Homemade Frappuccino','[{"name": "3 cups coffee (strong; use double the amount of coffee grounds when brewing the coffee)", "color": "#85583C", "parts": 1}, {"name": "2/3 can sweetened condensed milk", "color": "#EF1C3D", "parts": 1}, {"name": "1 cup whole milk", "color": "#F4F4FC", "parts": 1}, {"name": "1/2 vanilla bean", "color": "#FCFAF2", "parts": 1}, {"name": "2 teaspoons vanilla", "color": "#FCF4F7", "parts": 1}]');
\ No newline at end of file
+(1,'French Cafe au Lait Recipe',1),
+(2,'Pour-Over Coffee',1),
+(3,'Cuban Coffee (Cafecito)',1),
+(4,'The Perfect Cappuccino',1),
+(5,'New Orleans Coffee',1),
+(6,'Cold Brew Coffee',1),
+(7,'Affogato',1),
+(8,'Copycat Maple Pecan Latte',1),
+(9,'White Chocolate Mocha',1),
+(10,'Homemade Frappuccino',1);
+
+INSERT INTO ingredients VALUES
+(1,1,0,'1 part hot strong coffee (French roast)','#44240C',1),
+(2,1,1,'1 part steamed milk','#F3F4FC',1),
+(3,2,0,'2/3 ounce/18 grams coffee (medium-fine grind)','#9D6947',1),
+(4,2,1,'10 ounces/300mL filtered, distilled, or spring water','#C8EBFC',1),
+(5,3,0,'1/4 to 1/2 cup coffee (finely ground; or amount needed for pot)','#85583C',1),
+(6,3,1,'1 1/2 cups water (or amount for coffee pot)','#E4F4FB',2),
+(7,3,2,'1/4 cup white granulated sugar','#EDE1D9',1),
+(8,4,0,'2 shots (a double shot)','#BB301B',2),
+(9,4,1,'4 ounces milk','#C3CCF4',4),
+(10,5,0,'4 tablespoons drip-ground coffee','#C2802F',1),
+(11,5,1,'2 tablespoons chicory','#D6E551',1),
+(12,5,2,'Optional: 1/4 teaspoon salt','#0B1B3F',1),
+(13,5,3,'4 cups filtered water','#A0B8DD',1),
+(14,6,0,'1 cup coffee (coarsely ground)','#593827',1),
+(15,6,1,'4 cups filtered or distilled water','#C8EBFC',4),
+(16,7,0,'1 scoop vanilla gelato (or ice cream)','#FCFAF2',1),
+(17,7,1,'2 ounces hot espresso (or strongly hot brewed coffee)','#AC0A10',1),
+(18,7,2,'1 piece chocolate (grated)','#A88C69',1),
+(19,8,0,'1/4 cup maple syrup','#F20F28',1),
+(20,8,1,'1/4 cup pecan butter','#408BBD',1),
+(21,8,2,'2 tablespoons brown sugar','#EDE1D9',1),
+(22,8,3,'1/2 tablespoon butter','#BC9B4A',1),
+(23,8,4,'1/3 cup heavy cream','#D18C98',1),
+(24,9,0,'3/4 cup milk (whole or low-fat)','#2444B9',1),
+(25,9,1,'3 tablespoons white chocolate chips','#A88C69',1),
+(26,9,2,'1/2 cup prepared coffee','#593827',1),
+(27,10,0,'3 cups coffee (strong; use double the amount of coffee grounds when brewing the coffee)','#85583C',1),
+(28,10,1,'2/3 can sweetened condensed milk','#EF1C3D',1),
+(29,10,2,'1 cup whole milk','#F4F4FC',1),
+(30,10,3,'1/2 vanilla bean','#FCFAF2',1),
+(31,10,4,'2 teaspoons vanilla','#FCF4F7',1);
\ No newline at end of file
@@ -8,23 +8,44 @@
 
 __author__ = "Filipe Bezerra de Sousa"
 
+import json
 import logging
 
 from flasgger import Swagger
-from flask import Flask, request, jsonify, abort
+from flask import (
+    Flask,
+    Response,
+    request,
+    jsonify,
+    abort,
+    stream_with_context,
+)
 from flask_cors import CORS
-from jsonpatch import JsonPatchException
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from werkzeug.exceptions import HTTPException
 
-from .auth.auth import AuthError, requires_auth
+from .auth.auth import AuthError, check_permissions, requires_auth
 from .database.data_manager import DrinkDataManager
 from .database.models import setup_db
+from .timing import RequestTiming, timed
+
+MAX_BULK_DRINKS = 1000
+MAX_TITLE_LENGTH = 80
+MAX_INGREDIENT_NAME_LENGTH = 180
+MAX_COLOR_LENGTH = 20
+INVALID_TITLE = (
+    f"The drink title must be a non blank string of at most "
+    f"{MAX_TITLE_LENGTH} characters"
+)
+
+# Time the serialization of every JSON response
+jsonify = timed("jsonify")(jsonify)
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 swagger = Swagger(app)
+RequestTiming(app)
 logging.basicConfig(filename="api.log", level=logging.ERROR)
 
 
@@ -44,6 +65,106 @@ def after_request(response):
     return response
 
 
+def menu_response(body, etag, visibility):
+    """Respond a serialized menu, or ``304 Not Modified`` if the client
+    already has it.
+
+    :param body: The JSON bytes of the menu.
+    :param etag: The ETag of the menu.
+    :param visibility: ``public`` if shared caches may store the menu,
+     ``private`` otherwise.
+    :return: The response object.
+    """
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"{visibility}, no-cache"
+    return response.make_conditional(request)
+
+
+def is_valid_text(value, max_length):
+    """Check a value is a non blank str that fits its column.
+
+    :param value: The value of an attribute.
+    :param max_length: The length of the column.
+    :return: True if the value is valid.
+    """
+    return (
+        isinstance(value, str)
+        and bool(value.strip())
+        and len(value) <= max_length
+    )
+
+
+def is_valid_ingredient(item):
+    """Check an item of a recipe has a name and a color that fit their
+    columns, and a positive whole number of parts, which is stored in an
+    integer column.
+
+    :param item: The dict with the attributes of an ingredient.
+    :return: True if the item is valid.
+    """
+    if not isinstance(item, dict):
+        return False
+
+    parts = item.get("parts")
+    return (
+        is_valid_text(item.get("name"), MAX_INGREDIENT_NAME_LENGTH)
+        and is_valid_text(item.get("color"), MAX_COLOR_LENGTH)
+        and isinstance(parts, int)
+        and not isinstance(parts, bool)
+        and parts > 0
+    )
+
+
+def is_valid_recipe(recipe):
+    """Check a recipe is a non empty list of valid items.
+
+    :param recipe: The recipe of a Drink.
+    :return: True if the recipe is valid.
+    """
+    return (
+        isinstance(recipe, list)
+        and bool(recipe)
+        and all(is_valid_ingredient(item) for item in recipe)
+    )
+
+
+def is_valid_title(title):
+    """Check a title is a non blank str that fits the ``title`` column.
+
+    :param title: The title of a Drink.
+    :return: True if the title is valid.
+    """
+    return is_valid_text(title, MAX_TITLE_LENGTH)
+
+
+def has_invalid_title(drink):
+    """Check a drink has a title which is not valid, e.g. a list, so it can
+    be told apart from a missing title.
+
+    :param drink: The dict with Drink attributes.
+    :return: True if the drink has a title and it's not valid.
+    """
+    return (
+        isinstance(drink, dict)
+        and drink.get("title") is not None
+        and not is_valid_title(drink["title"])
+    )
+
+
+def is_valid_drink(drink):
+    """Check a drink has a valid title and a valid recipe.
+
+    :param drink: The dict with Drink attributes.
+    :return: True if the drink is valid.
+    """
+    return (
+        isinstance(drink, dict)
+        and is_valid_title(drink.get("title"))
+        and is_valid_recipe(drink.get("recipe"))
+    )
+
+
 @app.route("/drinks")
 def get_drinks():
     """Get a list of Drink with a short form of the recipe.
@@ -56,12 +177,15 @@ def get_drinks():
         properties:
           color:
             type: string
+            description: At most 20 characters.
             example: brown
           name:
             type: string
+            description: At most 180 characters.
             example: grams coffee
           parts:
             type: integer
+            description: A positive whole number.
             example: 1
       Drink:
         type: object
@@ -72,12 +196,22 @@ def get_drinks():
           title:
             type: string
             example: Cafecito
+          version:
+            type: integer
+            example: 1
           recipe:
             type: array
             $ref: '#/definitions/Recipe'
+    parameters:
+      - name: If-None-Match
+        in: header
+        description: The ETag of the menu the client already has.
+        type: string
     produces:
       - application/json
     responses:
+      304:
+        description: If the menu didn't change since the given ETag.
       200:
         description: A dictionary with the attributes **success** equals to
             ``true``, a ``list`` of drinks with a short form of the recipe.
@@ -95,8 +229,8 @@ def get_drinks():
               {"color":"#C8EBFC","parts":1}],"title":"Pour-Over Coffee"}]
 
     """
-    drinks = DrinkDataManager.list_drinks(False)
-    return jsonify({"success": True, "drinks": drinks,})
+    menu = DrinkDataManager.get_menu()
+    return menu_response(menu.short, menu.short_etag, "public")
 
 
 @app.route("/drinks-detail")
@@ -106,6 +240,11 @@ def get_drinks_detail(payload):
     ---
     tags:
       - drinks
+    parameters:
+      - name: If-None-Match
+        in: header
+        description: The ETag of the menu the client already has.
+        type: string
     produces:
       - application/json
     responses:
@@ -116,6 +255,8 @@ def get_drinks_detail(payload):
         description: If the user is not authenticated.
       400:
         description: If the authorization token is not valid.
+      304:
+        description: If the menu didn't change since the given ETag.
       200:
         description: A dictionary with the attributes **success** equals to
             ``true``, a ``list`` of drinks with a long form of the recipe.
@@ -136,8 +277,8 @@ def get_drinks_detail(payload):
               "title":"Pour-Over Coffee"}]
 
     """
-    drinks = DrinkDataManager.list_drinks()
-    return jsonify({"success": True, "drinks": drinks,})
+    menu = DrinkDataManager.get_menu()
+    return menu_response(menu.long, menu.long_etag, "private")
 
 
 @app.route("/drinks", methods=["POST"])
@@ -175,6 +316,9 @@ def post_drink(payload):
             resource.
       401:
         description: If the user is not authenticated.
+      422:
+        description: If the drink title is not a non blank string of at most
+            80 characters.
       400:
         description: If the authorization token is not valid or if the drink
             title is already took.
@@ -198,16 +342,9 @@ def post_drink(payload):
     """
     body = request.get_json()
 
-    recipe = body.get("recipe")
-
-    if (
-            not all([body.get("title"), recipe])
-            or not isinstance(recipe, list)
-            or not all(
-                all([item.get("color"), item.get("name"), item.get("parts")])
-                for item in recipe
-            )
-    ):
+    if has_invalid_title(body):
+        abort(422, description=f"{INVALID_TITLE}.")
+    if not is_valid_drink(body):
         abort(400, description="All fields are required.")
 
     try:
@@ -248,6 +385,11 @@ def patch_drink(payload, drink_id):
               description: A single attribute of even the full recipe of the
                     drink.
               $ref: '#/definitions/Recipe'
+            version:
+              type: integer
+              description: The version of the drink the updates are based
+                    on. If the drink was updated since, nothing is updated.
+              example: 1
     consumes:
       - application/json
     produces:
@@ -255,6 +397,11 @@ def patch_drink(payload, drink_id):
     responses:
       500:
         description: If something goes wrong within our end.
+      422:
+        description: If the drink title is not a non blank string of at most
+            80 characters.
+      409:
+        description: If the drink was updated since the given version.
       404:
         description: If the given ID doesn't exists.
       403:
@@ -285,15 +432,12 @@ def patch_drink(payload, drink_id):
     """
     body = request.get_json()
 
-    if not any([body.get("title"), body.get("recipe")]) or (
-            "recipe" in body
-            and not (
-                isinstance(body["recipe"], list)
-                and all(
-                    any([item["color"], item["name"], item["parts"]])
-                    for item in body["recipe"]
-                )
-            )
+    if has_invalid_title(body):
+        abort(422, description=f"{INVALID_TITLE}.")
+    if (
+            not isinstance(body, dict)
+            or not any([body.get("title"), body.get("recipe")])
+            or ("recipe" in body and not is_valid_recipe(body["recipe"]))
     ):
         abort(
             400,
@@ -301,12 +445,18 @@ def patch_drink(payload, drink_id):
             '"all recipe attributes".',
         )
 
+    version = body.get("version")
+    if version is not None and (
+            not isinstance(version, int) or isinstance(version, bool)
+    ):
+        abort(400, description='The "version" must be an integer.')
+
     try:
         drink = DrinkDataManager.update_drink(drink_id, body)
         return jsonify({"success": True, "drinks": [drink],})
     except IntegrityError:
         abort(400, "The drink title is already took.")
-    except (SQLAlchemyError, JsonPatchException) as exc:
+    except SQLAlchemyError as exc:
         app.logger.error(str(exc))
         abort(500)
 
@@ -360,6 +510,148 @@ def delete_drink(payload, drink_id):
         abort(500)
 
 
+@app.route("/drinks:bulk", methods=["POST"])
+@requires_auth("post:drinks")
+def post_drinks_bulk(payload):
+    """Add or update many Drink by title at once, e.g. to roll out a whole
+    menu, from a JSON Lines body.
+    ---
+    tags:
+      - drinks
+    parameters:
+      - name: body
+        in: body
+        description: One Drink JSON per line, with the title and the full
+            recipe like when adding a Drink. A Drink whose title already
+            exists gets its recipe replaced. Other attributes, e.g. those of
+            an export, are ignored.
+        schema:
+          type: string
+          example: '{"title":"Cafe Con Leche","recipe":[{"color":"brown",
+              "name":"grams coffee","parts":1}]}'
+    consumes:
+      - application/x-ndjson
+    produces:
+      - application/x-ndjson
+    responses:
+      500:
+        description: If something goes wrong within our end.
+      403:
+        description: If the authenticated user is not allowed to both add
+            and update drinks.
+      401:
+        description: If the user is not authenticated.
+      422:
+        description: If the title of a line is not a non blank string of at
+            most 80 characters, then no Drink is added or updated.
+      400:
+        description: If the authorization token is not valid or if a line
+            is not a valid Drink, then no Drink is added or updated.
+      200:
+        description: One JSON per line of the body, with the **line**
+            number, the **code** ``201`` if the drink was added or ``200``
+            if it was updated, and the **drink** with a short form of the
+            recipe.
+        schema:
+          type: string
+          example: '{"code":201,"drink":{"id":20,"recipe":[{"color":"brown",
+              "parts":1}],"title":"Cafe Con Leche","version":1},"line":1}'
+
+    """
+    check_permissions("patch:drinks", payload)
+
+    lines = [
+        (number, line)
+        for number, line in enumerate(
+            request.get_data(as_text=True).splitlines(), start=1
+        )
+        if line.strip()
+    ]
+    if not lines:
+        abort(400, description="At least one drink is required.")
+    if len(lines) > MAX_BULK_DRINKS:
+        abort(
+            400, description=f"At most {MAX_BULK_DRINKS} drinks are allowed."
+        )
+
+    drinks = []
+    titles = set()
+    for number, line in lines:
+        try:
+            drink = json.loads(line)
+        except ValueError:
+            abort(400, description=f"Line {number} is not valid JSON.")
+        if has_invalid_title(drink):
+            abort(422, description=f"{INVALID_TITLE}, line {number}.")
+        if not is_valid_drink(drink):
+            abort(400, description=f"All fields are required, line {number}.")
+        if drink["title"] in titles:
+            abort(
+                400,
+                description=f"The drink title is repeated, line {number}.",
+            )
+        titles.add(drink["title"])
+        drinks.append(drink)
+
+    try:
+        imported = DrinkDataManager.import_drinks(drinks)
+    except IntegrityError:
+        abort(400, "The drink title is already took.")
+    except SQLAlchemyError as exc:
+        app.logger.error(str(exc))
+        abort(500)
+
+    results = [
+        json.dumps(
+            {"line": number, "code": 201 if created else 200, "drink": drink},
+            separators=(",", ":"),
+            sort_keys=True,
+        )
+        + "\n"
+        for (number, _), (created, drink) in zip(lines, imported)
+    ]
+    return Response(results, mimetype="application/x-ndjson")
+
+
+@app.route("/drinks:export")
+@requires_auth("get:drinks-detail")
+def export_drinks(payload):
+    """Export every Drink with a long form of the recipe as JSON Lines,
+    which can be added to another menu by ``POST /drinks:bulk``.
+    ---
+    tags:
+      - drinks
+    produces:
+      - application/x-ndjson
+    responses:
+      403:
+        description: If the authenticated user is now allowed to access this
+            resource.
+      401:
+        description: If the user is not authenticated.
+      400:
+        description: If the authorization token is not valid.
+      200:
+        description: One Drink JSON per line with a long form of the recipe,
+            ordered by ID.
+        schema:
+          type: string
+          example: '{"id":20,"recipe":[{"color":"brown",
+              "name":"grams coffee","parts":1}],"title":"Cafe Con Leche",
+              "version":1}'
+
+    """
+
+    def generate():
+        for drink in DrinkDataManager.export_drinks():
+            yield json.dumps(drink, separators=(",", ":"), sort_keys=True)
+            yield "\n"
+
+    return Response(
+        stream_with_context(generate()), mimetype="application/x-ndjson"
+    )
+
+
 @app.errorhandler(HTTPException)
 def handle_http_exception(exception):
     """Handle any HTTP error when handling any HTTP request.
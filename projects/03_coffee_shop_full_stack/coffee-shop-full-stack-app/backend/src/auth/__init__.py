@@ -8,6 +8,9 @@ the API.
 The classes included here are:
 
 - :class:`AuthError`: communicate auth failure modes.
+- :class:`JWKSKeyStore`: caches the signing keys of the authorization server.
+- :class:`TokenCache`: caches the payload of the verified tokens.
+- :class:`Permissions`: the permissions of a token compiled for fast checks.
 
 The decorators included here are:
 
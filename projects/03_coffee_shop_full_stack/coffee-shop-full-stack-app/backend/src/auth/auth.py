@@ -10,16 +10,28 @@
 
 __author__ = "Filipe Bezerra de Sousa"
 
-import json
+import os
 from functools import wraps
-from urllib.request import urlopen
 
 from flask import request
 from jose import jwt
 
+from ..timing import timed
+from .jwks import JWKSKeyStore
+from .permissions import Permissions
+from .token_cache import TokenCache, DEFAULT_MAX_SIZE
+
 AUTH0_DOMAIN = "fbs-fsnd.auth0.com"
 ALGORITHMS = ["RS256"]
 API_AUDIENCE = "coffee_shop_full_stack"
+JWKS_URL = os.getenv(
+    "JWKS_URL", f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+)
+
+key_store = JWKSKeyStore(JWKS_URL, ALGORITHMS[0])
+token_cache = TokenCache(
+    int(os.getenv("TOKEN_CACHE_SIZE", DEFAULT_MAX_SIZE))
+)
 
 
 class AuthError(Exception):
@@ -37,6 +49,7 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+@timed("get_token_auth_header")
 def get_token_auth_header():
     """Attempt to get the header from the request.
 
@@ -78,9 +91,24 @@ def get_token_auth_header():
     return token
 
 
+def compile_permissions(permissions):
+    """Compile the permissions claim of a payload for fast checks.
+
+    :param permissions: The list of permission strs of the payload, or a
+     single permission str.
+    :return: The ``Permissions``.
+    """
+    if isinstance(permissions, Permissions):
+        return permissions
+    if isinstance(permissions, str):
+        permissions = [permissions]
+    return Permissions(permissions)
+
+
+@timed("check_permissions")
 def check_permissions(permission, payload):
     """Check if the requested permission string is in the payload permissions
-    array.
+    array, or allowed by one of its wildcard permissions, e.g. ``post:*``.
 
     :param permission: The requested permission str.
     :param payload: The payload  dict containing parsed JWT.
@@ -97,7 +125,7 @@ def check_permissions(permission, payload):
             403,
         )
 
-    if permission not in payload["permissions"]:
+    if not compile_permissions(payload["permissions"]).allows(permission):
         raise AuthError(
             {"code": "unauthorized", "description": "Permission not found."},
             403,
@@ -106,6 +134,7 @@ def check_permissions(permission, payload):
     return True
 
 
+@timed("verify_decode_jwt")
 def verify_decode_jwt(token):
     """Verifies a JWT string’s signature and validates reserved claims.
 
@@ -129,20 +158,8 @@ def verify_decode_jwt(token):
             401,
         )
 
-    json_url_open = urlopen(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
-    jwks = json.loads(json_url_open.read())
-
-    rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"],
-                "kid": key["kid"],
-            }
-            break
+    with timed("jwks"):
+        rsa_key = key_store.get_key(unverified_header["kid"])
 
     if rsa_key:
         try:
@@ -200,6 +217,10 @@ def requires_auth(permission=""):
     """Require auth get, decode, verify the "Bearer token" and check the
     permission.
 
+    The payload of a verified token, with its permissions compiled, is cached
+    until the token expires, so a token sent again skips the signature
+    verification.
+
     :param permission: The requested permission str.
     :return: The requires auth decorator function including the header
      payload.
@@ -209,7 +230,17 @@ def requires_auth(permission=""):
         def wrapper(*args, **kwargs):
             try:
                 token = get_token_auth_header()
-                payload = verify_decode_jwt(token)
+                with timed("token_cache"):
+                    payload = token_cache.get(token)
+                if payload is None:
+                    payload = verify_decode_jwt(token)
+                    # Compiled once, the permissions are cached with the
+                    # payload
+                    if "permissions" in payload:
+                        payload["permissions"] = compile_permissions(
+                            payload["permissions"]
+                        )
+                    token_cache.put(token, payload)
                 check_permissions(permission, payload)
             except AuthError:
                 raise
@@ -0,0 +1,182 @@
+"""
+    jwks.py
+    -------
+
+    This module contains the :class:`JWKSKeyStore` class which is responsible
+    for caching the JSON Web Key Set used to verify the JWT tokens, so the
+    keys are not fetched from the authorization server on every request.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import json
+import logging
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+from jose import jwk
+
+DEFAULT_TTL = 600
+MIN_TTL = 60
+MAX_TTL = 86400
+REFRESH_AHEAD = 0.8
+UNKNOWN_KID_INTERVAL = 30
+FETCH_TIMEOUT = 5
+
+logger = logging.getLogger(__name__)
+
+
+def parse_max_age(cache_control):
+    """Parse the lifetime of a response from its ``Cache-Control`` header.
+
+    :param cache_control: The value of the ``Cache-Control`` header or
+     ``None``.
+    :return: The number of seconds the response can be cached, ``0`` if it
+     must not be cached or ``None`` if the header doesn't tell.
+    """
+    if not cache_control:
+        return None
+
+    directives = cache_control.lower()
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+
+    match = re.search(r"max-age=(\d+)", directives)
+    return int(match.group(1)) if match else None
+
+
+class JWKSKeyStore:
+    """Caches the signing keys of a JSON Web Key Set by ``kid``.
+
+    The keys are fetched on first use and kept for the lifetime given by the
+    ``Cache-Control`` header of the response, bounded by ``MIN_TTL`` and
+    ``MAX_TTL``. Once most of the lifetime has passed the keys are refreshed
+    by a background thread while the cached ones keep being served. A token
+    signed by an unknown ``kid`` triggers a single refetch, at most once
+    every ``UNKNOWN_KID_INTERVAL`` seconds since the last refetch triggered
+    by an unknown ``kid``, so a flood of forged tokens can't hammer the
+    authorization server while a key rotated in is still picked up right
+    away.
+
+    The URL can be a ``file://`` URL of a local stand-in JWKS file.
+    """
+
+    def __init__(self, url, algorithm="RS256", default_ttl=DEFAULT_TTL,
+                 unknown_kid_interval=UNKNOWN_KID_INTERVAL):
+        """Create a new instance of the ``JWKSKeyStore``.
+
+        :param url: The URL of the JSON Web Key Set.
+        :param algorithm: The signing algorithm of the keys.
+        :param default_ttl: The number of seconds the keys are cached when the
+         response has no ``Cache-Control`` header.
+        :param unknown_kid_interval: The minimum number of seconds between two
+         refetches triggered by unknown ``kid``.
+        """
+        self.url = url
+        self.algorithm = algorithm
+        self.default_ttl = default_ttl
+        self.unknown_kid_interval = unknown_kid_interval
+        self.keys = None
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        # Only the refetches triggered by unknown kid start a new interval
+        self.unknown_kid_fetched_at = float("-inf")
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get_key(self, kid):
+        """Get the RSA key of a ``kid``.
+
+        :param kid: The ID of the key from the header of the token.
+        :return: The RSA public key object or ``None`` if the key set has no
+         such ``kid``.
+        :raise URLError: If the key set can't be fetched and no key is cached.
+        """
+        now = time.monotonic()
+        if self.keys is None or now >= self.expires_at:
+            self._refresh_if(lambda: self.keys is None or
+                             time.monotonic() >= self.expires_at)
+        elif now >= self._refresh_at() and not self.refreshing:
+            self._refresh_in_background()
+
+        key = self.keys.get(kid)
+        if key is None:
+            fetched_at = self.unknown_kid_fetched_at
+            if time.monotonic() - fetched_at >= self.unknown_kid_interval:
+
+                def is_needed():
+                    # Only the first request waiting for the lock refetches
+                    if self.unknown_kid_fetched_at != fetched_at:
+                        return False
+                    self.unknown_kid_fetched_at = time.monotonic()
+                    return True
+
+                self._refresh_if(is_needed)
+                key = self.keys.get(kid)
+
+        return key
+
+    def refresh(self):
+        """Fetch the key set and replace the cached keys."""
+        with urlopen(self.url, timeout=FETCH_TIMEOUT) as response:
+            jwks = json.loads(response.read())
+            max_age = parse_max_age(response.headers.get("Cache-Control"))
+
+        ttl = self.default_ttl if max_age is None else max_age
+        ttl = max(MIN_TTL, min(MAX_TTL, ttl))
+
+        # Parsing the RSA public keys once spares it on every verification
+        self.keys = {
+            key["kid"]: jwk.construct(
+                {
+                    "kty": key["kty"],
+                    "use": key["use"],
+                    "n": key["n"],
+                    "e": key["e"],
+                    "kid": key["kid"],
+                },
+                algorithm=self.algorithm,
+            )
+            for key in jwks["keys"]
+            if key.get("kty") == "RSA" and "kid" in key
+        }
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at + ttl
+
+    def _refresh_at(self):
+        return self.fetched_at + (
+            self.expires_at - self.fetched_at
+        ) * REFRESH_AHEAD
+
+    def _refresh_if(self, is_needed):
+        with self.lock:
+            if not is_needed():
+                return
+            try:
+                self.refresh()
+            except Exception:
+                if self.keys is None:
+                    raise
+                # Keep serving the cached keys for a while before retrying
+                logger.exception("Unable to refresh the JWKS, using the "
+                                 "cached keys.")
+                self.fetched_at = time.monotonic()
+                self.expires_at = self.fetched_at + MIN_TTL
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self._refresh_if(
+                    lambda: time.monotonic() >= self._refresh_at()
+                )
+            finally:
+                self.refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
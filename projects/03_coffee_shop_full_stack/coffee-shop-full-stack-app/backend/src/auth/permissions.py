@@ -0,0 +1,91 @@
+"""
+    permissions.py
+    --------------
+
+    This module contains the :class:`Permissions` class which is responsible
+    for checking the permissions granted by a token in constant time, however
+    many permissions the token has, including wildcard permissions.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+SEPARATOR = ":"
+WILDCARD = "*"
+# The first segment of the permissions of the API, e.g. ``post:drinks``
+VERBS = frozenset(["get", "post", "patch", "put", "delete"])
+# Marks the end of a permission within the trie
+END = None
+
+
+class Permissions(frozenset):
+    """The permissions of a token compiled for fast checks.
+
+    A permission is made of segments separated by ``:``, e.g.
+    ``post:drinks``. A granted permission can have ``*`` segments, each
+    one allowing any segment, and a trailing ``*`` allowing any remaining
+    segments, e.g. ``post:*`` allows ``post:drinks`` and ``*`` allows
+    everything.
+
+    A resource-scoped permission, a resource followed by ``*`` like
+    ``drinks:*``, allows every verb on that resource, so it's compiled as
+    ``*:drinks``. It doesn't allow the other resources, e.g.
+    ``get:drinks-detail`` needs ``drinks-detail:*``.
+
+    The exact permissions are looked up in the frozenset, and the wildcard
+    permissions are compiled into a trie of segments, so a check costs the
+    same however many permissions were granted.
+    """
+
+    def __init__(self, permissions=()):
+        """Create a new instance of the ``Permissions``.
+
+        :param permissions: The iterable of the granted permission strs.
+        """
+        super().__init__()
+        self.trie = {}
+        for permission in self:
+            if isinstance(permission, str) and WILDCARD in permission:
+                node = self.trie
+                for segment in self._segments(permission):
+                    node = node.setdefault(segment, {})
+                node[END] = True
+
+    @staticmethod
+    def _segments(permission):
+        segments = permission.split(SEPARATOR)
+        if (
+            len(segments) == 2
+            and segments[1] == WILDCARD
+            and segments[0] not in VERBS
+            and segments[0] != WILDCARD
+        ):
+            # A resource-scoped permission, e.g. drinks:*
+            return [WILDCARD, segments[0]]
+        return segments
+
+    def allows(self, permission):
+        """Check if a permission is granted.
+
+        :param permission: The requested permission str.
+        :return: True if the permission or a wildcard permission matching it
+         is granted.
+        """
+        if permission in self:
+            return True
+        if not self.trie:
+            return False
+        return self._match(self.trie, permission.split(SEPARATOR), 0)
+
+    def _match(self, node, segments, index):
+        if index == len(segments):
+            return END in node
+
+        child = node.get(segments[index])
+        if child is not None and self._match(child, segments, index + 1):
+            return True
+
+        wildcard = node.get(WILDCARD)
+        if wildcard is None:
+            return False
+        # A trailing wildcard allows any remaining segments
+        return END in wildcard or self._match(wildcard, segments, index + 1)
@@ -0,0 +1,78 @@
+"""
+    token_cache.py
+    --------------
+
+    This module contains the :class:`TokenCache` class which is responsible
+    for remembering the payload of the JWT tokens already verified, so a
+    token sent again skips the signature verification until it expires.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 1024
+
+
+class TokenCache:
+    """A bounded LRU of verified token payloads.
+
+    The tokens are keyed by their SHA-256 digest, so the cache doesn't hold
+    the bearer tokens themselves, and each payload expires at the ``exp``
+    claim of its token. The least recently used token is evicted once the
+    cache is full.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        """Create a new instance of the ``TokenCache``.
+
+        :param max_size: The maximum number of tokens to remember.
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        """Get the payload of a token verified before.
+
+        :param token: The JWT token.
+        :return: The payload or ``None`` if the token is unknown or expired.
+        """
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return payload
+
+    def put(self, token, payload):
+        """Remember the payload of a verified token until it expires.
+
+        :param token: The JWT token.
+        :param payload: The dict of the verified claims, tokens without an
+         ``exp`` claim are not remembered.
+        """
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (payload, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
@@ -9,8 +9,11 @@ The classes included here are:
 
 - :class:`Drink`: the drink entity, is persistent and extends the base SQLAlchemy
   Model.
+- :class:`Ingredient`: the ingredient of the recipe of a drink, is persistent and
+  extends the base SQLAlchemy Model.
 - :class:`DrinkDataManager`: the drink data manager, it contains static functions
   that manages the :class:`Drink` data set.
+- :class:`MenuCache`: caches the serialized menu until a drink changes.
 """
 
 __author__ = "Filipe Bezerra de Sousa"
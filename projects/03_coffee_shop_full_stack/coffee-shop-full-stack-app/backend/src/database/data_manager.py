@@ -8,17 +8,22 @@
 
 __author__ = "Filipe Bezerra de Sousa"
 
-import json
+from flask import abort
 
-from jsonpatch import JsonPatch
+from ..timing import timed
+from .menu_cache import MenuCache
+from .models import db, Drink, Ingredient
 
-from .models import Drink
+EXPORT_CHUNK_SIZE = 100
+
+menu_cache = MenuCache()
 
 
 class DrinkDataManager:
     """Contains static methods that manages the Drink data set."""
 
     @staticmethod
+    @timed("db.list_drinks")
     def list_drinks(long_representation=True):
         """Retrieve a list of ``Drink`` from the database.
 
@@ -33,6 +38,17 @@ class DrinkDataManager:
         return drinks
 
     @staticmethod
+    @timed("db.get_menu")
+    def get_menu():
+        """Retrieve the serialized snapshot of the drinks menu.
+
+        :return: A ``MenuSnapshot`` with the short and long forms of the menu
+         as JSON bytes and their ETags.
+        """
+        return menu_cache.get()
+
+    @staticmethod
+    @timed("db.create_drink")
     def create_drink(drink_dict):
         """Insert the ``Drink`` to the database.
 
@@ -42,33 +58,122 @@ class DrinkDataManager:
         """
         new_drink = Drink(
             title=drink_dict.get("title"),
-            recipe=json.dumps(drink_dict.get("recipe")),
+            recipe=drink_dict.get("recipe"),
         )
         new_drink.insert()
+        menu_cache.invalidate()
         return new_drink.short()
 
     @staticmethod
+    @timed("db.update_drink")
     def update_drink(drink_id, updates_dict):
         """Apply the updates to an existing ``drink_id`` to the database.
 
+        Only the given fields are written, by a single ``UPDATE`` of the
+        drink which also increments its version, and if the recipe is given
+        its ingredients are replaced within the same transaction.
+
         :param drink_id: The id of the Drink.
         :param updates_dict: The dict containing the updates to the existing
-         Drink.
+         Drink, and optionally the ``version`` the updates are based on.
         :return: A short form representation of the Drink updated.
+        :raise NotFound: If the Drink doesn't exist.
+        :raise Conflict: If the Drink was updated since the given ``version``.
         """
-        drink = Drink.query.get_or_404(drink_id)
+        values = {Drink.version: Drink.version + 1}
+        if "title" in updates_dict:
+            values[Drink.title] = updates_dict["title"]
+
+        query = Drink.query.filter(Drink.id == drink_id)
+        if updates_dict.get("version") is not None:
+            query = query.filter(Drink.version == updates_dict["version"])
+
+        if not query.update(values, synchronize_session=False):
+            db.session.rollback()
+            Drink.query.get_or_404(drink_id)
+            abort(
+                409,
+                description="The drink was updated by someone else, get it "
+                "again and retry.",
+            )
 
         if "recipe" in updates_dict:
-            updates_dict["recipe"] = json.dumps(updates_dict["recipe"])
+            Ingredient.query.filter(Ingredient.drink_id == drink_id).delete(
+                synchronize_session=False
+            )
+            db.session.bulk_insert_mappings(
+                Ingredient,
+                [
+                    dict(row, drink_id=drink_id)
+                    for row in Ingredient.rows(updates_dict["recipe"])
+                ],
+            )
+
+        db.session.commit()
+        menu_cache.invalidate()
+        return Drink.query.get(drink_id).short()
 
-        drink_dict = drink.asdict(exclude_pk=True)
-        patch_instance = JsonPatch.from_diff(drink_dict, updates_dict)
-        new_drink_dict = patch_instance.apply(drink_dict)
-        drink.fromdict(new_drink_dict)
-        drink.update()
-        return drink.short()
+    @staticmethod
+    @timed("db.import_drinks")
+    def import_drinks(drinks):
+        """Insert or update many ``Drink`` by title in a single transaction.
+
+        The drinks with a title already in the database get their recipe
+        replaced and their version incremented, the others are inserted.
+
+        :param drinks: The list of dicts with Drink attributes.
+        :return: A list with a tuple for each drink, ``True`` if it was
+         inserted or ``False`` if it was updated, and the short form
+         representation of the Drink.
+        """
+        titles = [drink_dict["title"] for drink_dict in drinks]
+        existing = {
+            drink.title: drink
+            for drink in Drink.query.filter(Drink.title.in_(titles))
+        }
+
+        imported = []
+        for drink_dict in drinks:
+            drink = existing.get(drink_dict["title"])
+            if drink is None:
+                drink = Drink(
+                    title=drink_dict["title"], recipe=drink_dict["recipe"]
+                )
+                db.session.add(drink)
+                imported.append((True, drink))
+            else:
+                drink.recipe = drink_dict["recipe"]
+                drink.version = Drink.version + 1
+                imported.append((False, drink))
+
+        db.session.commit()
+        menu_cache.invalidate()
+        return [(created, drink.short()) for created, drink in imported]
+
+    @staticmethod
+    def export_drinks(chunk_size=EXPORT_CHUNK_SIZE):
+        """Retrieve every ``Drink`` from the database by chunks.
+
+        :param chunk_size: The number of drinks read by each query.
+        :return: A generator of the long form representation of the Drinks
+         ordered by id.
+        """
+        last_id = 0
+        while True:
+            drinks = (
+                Drink.query.filter(Drink.id > last_id)
+                .order_by(Drink.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not drinks:
+                return
+            for drink in drinks:
+                yield drink.long()
+            last_id = drinks[-1].id
 
     @staticmethod
+    @timed("db.delete_drink")
     def delete_drink(drink_id):
         """Delete the ``Drink`` from the database.
 
@@ -76,3 +181,4 @@ class DrinkDataManager:
         """
         drink = Drink.query.get_or_404(drink_id)
         drink.delete()
+        menu_cache.invalidate()
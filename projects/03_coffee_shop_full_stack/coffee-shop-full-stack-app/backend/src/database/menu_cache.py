@@ -0,0 +1,105 @@
+"""
+    menu_cache.py
+    -------------
+
+    This module contains the :class:`MenuCache` class which is responsible
+    for keeping a serialized snapshot of the drinks menu, so the menu polled
+    by every customer display is not queried and serialized on every request.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .models import Drink
+
+MAX_AGE = float(os.getenv("MENU_CACHE_MAX_AGE", 5))
+
+
+def serialize_menu(drinks):
+    """Serialize a menu the way the API responds it.
+
+    :param drinks: The list of drinks in a short or long form.
+    :return: A tuple with the JSON bytes and their ETag.
+    """
+    body = json.dumps(
+        {"success": True, "drinks": drinks},
+        separators=(",", ":"),
+        sort_keys=True,
+    ).encode("utf-8")
+    return body, hashlib.sha1(body).hexdigest()
+
+
+class MenuSnapshot:
+    """The menu serialized in both forms at a given version."""
+
+    def __init__(self, version, drinks):
+        """Create a new instance of the ``MenuSnapshot``.
+
+        :param version: The version of the menu when the drinks were read.
+        :param drinks: The list of ``Drink``.
+        """
+        self.version = version
+        self.built_at = time.monotonic()
+        self.short, self.short_etag = serialize_menu(
+            [drink.short() for drink in drinks]
+        )
+        self.long, self.long_etag = serialize_menu(
+            [drink.long() for drink in drinks]
+        )
+
+
+class MenuCache:
+    """Caches a :class:`MenuSnapshot` until the menu changes.
+
+    Every committed change of a drink bumps the version of the menu, and the
+    snapshot is rebuilt by the next request. Since the changes committed by
+    other worker processes can't bump the version of this one, a snapshot is
+    also rebuilt once older than ``MENU_CACHE_MAX_AGE`` seconds. The ETags
+    are digests of the bytes, so they stay the same across rebuilds and
+    workers as long as the menu doesn't change.
+    """
+
+    def __init__(self, max_age=MAX_AGE):
+        """Create a new instance of the ``MenuCache``.
+
+        :param max_age: The maximum number of seconds a snapshot is served.
+        """
+        self.max_age = max_age
+        self.version = 0
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Get the snapshot of the current menu, rebuilding it if needed.
+
+        :return: The ``MenuSnapshot``.
+        """
+        snapshot = self.snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        with self.lock:
+            # Only the first request waiting for the lock rebuilds it
+            snapshot = self.snapshot
+            if not self._is_fresh(snapshot):
+                version = self.version
+                snapshot = MenuSnapshot(version, Drink.query.all())
+                self.snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """Bump the version of the menu after a change was committed."""
+        with self.lock:
+            self.version += 1
+
+    def _is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and snapshot.version == self.version
+            and time.monotonic() - snapshot.built_at < self.max_age
+        )
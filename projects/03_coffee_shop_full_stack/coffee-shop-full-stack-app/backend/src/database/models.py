@@ -2,8 +2,8 @@
     models.py
     -------
 
-    This module contains the :class:`Drink` class which is responsible for
-    holding data about drinks and their recipes.
+    This module contains the :class:`Drink` and :class:`Ingredient` classes
+    which are responsible for holding data about drinks and their recipes.
 """
 
 __author__ = "Filipe Bezerra de Sousa"
@@ -11,32 +11,170 @@ __author__ = "Filipe Bezerra de Sousa"
 import json
 import os
 
-from dictalchemy import make_class_dictable
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, ForeignKey, String, Integer, event, inspect
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import relationship
+from sqlalchemy.pool import QueuePool
 
 DATABASE_FILENAME = "database.db"
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = "sqlite:///{}".format(
     os.path.join(PROJECT_DIR, DATABASE_FILENAME)
 )
+DATABASE_URL = os.getenv("DATABASE_URL", DATABASE_PATH)
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "wal")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "normal")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
 
 db = SQLAlchemy()
-make_class_dictable(db.Model)
 
 
-def setup_db(app):
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent workers.
+
+    - The WAL journal lets readers go on while a worker writes.
+    - The busy timeout makes a writer wait for the lock instead of failing
+      right away with "database is locked".
+    - ``synchronous=NORMAL`` is still safe with WAL, only the last commits
+      may be lost on a power failure, and spares a fsync per commit.
+
+    :param dbapi_connection: The new DB-API connection.
+    :param connection_record: The record of the connection in the pool.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+
+def engine_options(database_url):
+    """Get the options of the engine of a database.
+
+    :param database_url: The URL of the database.
+    :return: A dict of keyword arguments of ``create_engine``.
+    """
+    url = make_url(database_url)
+    pool_options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    }
+
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {}
+        # Keep the connections open instead of reconnecting, and applying the
+        # pragmas, on every request. The pool hands a connection to a single
+        # thread at a time. The busy timeout of the driver, in seconds,
+        # matches the pragma.
+        return dict(
+            pool_options,
+            poolclass=QueuePool,
+            connect_args={
+                "timeout": SQLITE_BUSY_TIMEOUT / 1000,
+                "check_same_thread": False,
+            },
+        )
+
+    return dict(
+        pool_options,
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        pool_pre_ping=True,
+    )
+
+
+def setup_db(app, database_url=DATABASE_URL):
     """Bind a flask application and a SQLAlchemy service.
 
+    The database is the SQLite file ``database.db`` of this package, unless
+    the ``DATABASE_URL`` variable tells another one, e.g. a PostgreSQL URL.
+
     :param app: The flask application.
+    :param database_url: The URL of the database.
+    :raise RuntimeError: If the database was created by a previous version
+     and must be upgraded first, see :mod:`src.database.upgrade`.
     """
-    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_PATH
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
     db.app = app
     db.init_app(app)
+    if db.engine.dialect.name == "sqlite":
+        event.listen(db.engine, "connect", set_sqlite_pragmas)
+    if is_outdated(db.engine):
+        raise RuntimeError(
+            "The database was created by a previous version, upgrade it "
+            "once with: python -m src.database.upgrade"
+        )
     db.create_all()
 
 
+def is_outdated(engine):
+    """Check if the tables of a database were created by a previous version,
+    which stored the recipe as JSON and had no ``version`` column.
+
+    :param engine: The engine of the database.
+    :return: True if the database must be upgraded.
+    """
+    inspector = inspect(engine)
+    if "drinks" not in inspector.get_table_names():
+        return False
+    columns = {column["name"] for column in inspector.get_columns("drinks")}
+    return "version" not in columns or "recipe" in columns
+
+
+class Ingredient(db.Model):
+    """Ingredient, a persistent ingredient of the recipe of a drink, extends
+    the base SQLAlchemy Model."""
+
+    __tablename__ = "ingredients"
+
+    # Auto incrementing, unique primary key
+    id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
+    # The drink this ingredient belongs to
+    drink_id = Column(
+        Integer, ForeignKey("drinks.id", ondelete="CASCADE"), nullable=False
+    )
+    # The order of the ingredient within the recipe
+    position = Column(Integer, nullable=False)
+    name = Column(String(180), nullable=False)
+    color = Column(String(20), nullable=False)
+    parts = Column(Integer, nullable=False)
+
+    @staticmethod
+    def rows(recipe):
+        """Convert a recipe into the column values of its ingredients.
+
+        :param recipe: The list of {color, name, parts} dicts.
+        :return: A list of dicts with position, name, color and parts.
+        """
+        return [
+            {
+                "position": position,
+                "name": item["name"],
+                "color": item["color"],
+                "parts": item["parts"],
+            }
+            for position, item in enumerate(recipe)
+        ]
+
+    def short(self):
+        """Short form representation of the ``Ingredient`` model.
+
+        :return: A dict with {color, parts}.
+        """
+        return {"color": self.color, "parts": self.parts}
+
+    def long(self):
+        """Long form representation of the ``Ingredient`` model.
+
+        :return: A dict with {color, name, parts}.
+        """
+        return {"color": self.color, "name": self.name, "parts": self.parts}
+
+
 class Drink(db.Model):
     """Drink, a persistent drink entity, extends the base SQLAlchemy Model."""
 
@@ -46,31 +184,59 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
-    # the required data type is
-    # [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    # Incremented by every update, so an update based on a stale copy of the
+    # drink can be detected
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # The recipe is stored as rows of its ingredients, so reading a drink
+    # doesn't parse any JSON. The ingredients of many drinks are loaded at
+    # once by a single SELECT ... IN query.
+    ingredients = relationship(
+        Ingredient,
+        order_by=Ingredient.position,
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
+
+    @property
+    def recipe(self):
+        """The recipe as a list of {color, name, parts} dicts."""
+        return [ingredient.long() for ingredient in self.ingredients]
+
+    @recipe.setter
+    def recipe(self, recipe):
+        self.ingredients = [
+            Ingredient(**row) for row in Ingredient.rows(recipe)
+        ]
 
     def short(self):
         """Short form representation of the ``Drink`` model.
 
-        :return: A dict with title and only {color, parts} of the recipe.
+        It isn't stored along with the drink: the menu read by ``GET
+        /drinks`` is serialized by :class:`MenuCache` once per change, and
+        the single drink responses of the writes build it once.
+
+        :return: A dict with title, version and only {color, parts} of the
+         recipe.
         """
-        short_recipe = [
-            {"color": r["color"], "parts": r["parts"]}
-            for r in json.loads(self.recipe)
-        ]
-        return {"id": self.id, "title": self.title, "recipe": short_recipe}
+        short_recipe = [ingredient.short() for ingredient in self.ingredients]
+        return {
+            "id": self.id,
+            "title": self.title,
+            "version": self.version,
+            "recipe": short_recipe,
+        }
 
     def long(self):
         """Long form representation of the ``Drink`` model.
 
-        :return: A dict with title and {color, name, parts} of the recipe.
+        :return: A dict with title, version and {color, name, parts} of the
+         recipe.
         """
         return {
             "id": self.id,
             "title": self.title,
-            "recipe": json.loads(self.recipe),
+            "version": self.version,
+            "recipe": self.recipe,
         }
 
     def insert(self):
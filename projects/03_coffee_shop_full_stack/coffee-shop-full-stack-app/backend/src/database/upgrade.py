@@ -0,0 +1,136 @@
+"""
+    upgrade.py
+    ----------
+
+    This module upgrades a database created by a previous version of the
+    Coffee Shop API, which stored the recipe of each drink as a JSON string
+    and had no ``version`` column. It's a one-off step, run once before
+    starting the workers, which refuse to start on an outdated database:
+
+        python -m src.database.upgrade
+
+    The database is the one of the ``DATABASE_URL`` variable, like for the
+    server, unless a URL is given.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import json
+import sys
+
+from sqlalchemy import MetaData, create_engine, inspect, text
+
+from .models import DATABASE_URL, Drink, Ingredient, is_outdated
+
+
+def upgrade_db(engine):
+    """Upgrade the tables of a database created by a previous version.
+
+    Within a single transaction the ``ingredients`` table is created, the
+    JSON ``recipe`` of each drink is copied into its ingredient rows, and
+    the ``drinks`` table loses its ``recipe`` column and gets a ``version``
+    column with every drink at version 1.
+
+    :param engine: The engine of the database.
+    :return: True if the database was upgraded, False if it was up to date.
+    """
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            # Another upgrade waits for this one, then finds nothing to do
+            connection.execute(text("LOCK TABLE drinks IN EXCLUSIVE MODE"))
+        if not is_outdated(connection):
+            return False
+
+        inspector = inspect(connection)
+        columns = {
+            column["name"] for column in inspector.get_columns("drinks")
+        }
+        Ingredient.__table__.create(connection, checkfirst=True)
+        if "recipe" in columns:
+            copy_recipes(connection)
+
+        if engine.dialect.name == "sqlite":
+            rebuild_sqlite_drinks(connection, columns)
+        else:
+            if "version" not in columns:
+                connection.execute(
+                    text(
+                        "ALTER TABLE drinks "
+                        "ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+                    )
+                )
+            if "recipe" in columns:
+                connection.execute(
+                    text("ALTER TABLE drinks DROP COLUMN recipe")
+                )
+
+    return True
+
+
+def copy_recipes(connection):
+    """Copy the JSON recipe of each drink into its ingredient rows.
+
+    Drinks that already have ingredients are skipped.
+
+    :param connection: The connection of the upgrade transaction.
+    """
+    drinks = connection.execute(
+        text(
+            "SELECT id, recipe FROM drinks WHERE NOT EXISTS "
+            "(SELECT 1 FROM ingredients "
+            "WHERE ingredients.drink_id = drinks.id)"
+        )
+    ).fetchall()
+    rows = []
+    for drink_id, recipe in drinks:
+        recipe = json.loads(recipe)
+        if isinstance(recipe, dict):
+            recipe = [recipe]
+        rows.extend(
+            dict(row, drink_id=drink_id) for row in Ingredient.rows(recipe)
+        )
+    if rows:
+        connection.execute(Ingredient.__table__.insert(), rows)
+
+
+def rebuild_sqlite_drinks(connection, columns):
+    """Rebuild the ``drinks`` table of SQLite with the current columns.
+
+    SQLite can only drop a column since 3.35, so the table is copied into a
+    new one, the way the SQLite documentation advises for any change of a
+    table.
+
+    :param connection: The connection of the upgrade transaction.
+    :param columns: The set of the column names of the outdated table.
+    """
+    # Left behind by an interrupted upgrade, pysqlite runs the DDL before
+    # the first INSERT outside of the transaction
+    connection.execute(text("DROP TABLE IF EXISTS drinks_new"))
+    drinks_new = Drink.__table__.tometadata(MetaData(), name="drinks_new")
+    drinks_new.create(connection)
+    version = "version" if "version" in columns else "1"
+    connection.execute(
+        text(
+            "INSERT INTO drinks_new (id, title, version) "
+            f"SELECT id, title, {version} FROM drinks"
+        )
+    )
+    connection.execute(text("DROP TABLE drinks"))
+    connection.execute(text("ALTER TABLE drinks_new RENAME TO drinks"))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    database_url = argv[0] if argv else DATABASE_URL
+    engine = create_engine(database_url)
+    try:
+        if upgrade_db(engine):
+            print(f"Upgraded {database_url}")
+        else:
+            print(f"{database_url} is up to date")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+    timing.py
+    ---------
+
+    This module contains the :func:`timed` helper which measures the phases
+    of a request, e.g. the JWT verification or the database queries, and the
+    :class:`RequestTiming` extension which reports them as a
+    ``Server-Timing`` header, a structured log record and optionally as
+    sampled spans written to a local file.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+
+TRACE_FILE = os.getenv("TRACE_FILE")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+TIMING_LOG_FILE = os.getenv("TIMING_LOG_FILE", "timing.log")
+TIMING_LOG_LEVEL = os.getenv("TIMING_LOG_LEVEL", "INFO")
+
+logger = logging.getLogger("coffee_shop.timing")
+
+
+@contextmanager
+def timed(name):
+    """Measure a phase of the current request.
+
+    Can be used as a context manager or as a decorator. Outside of a request
+    handled by :class:`RequestTiming` nothing is measured.
+
+    :param name: The name of the phase.
+    """
+    if not has_app_context() or "timings" not in g:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.timings.append(
+            (name, started - g.timing_start, time.perf_counter() - started)
+        )
+
+
+class RequestTiming:
+    """Reports the phases measured by :func:`timed` of every request.
+
+    - The ``Server-Timing`` header gets the total duration of each phase and
+      of the request, in milliseconds, shown by the browser developer tools.
+    - A record is logged by the ``coffee_shop.timing`` logger with the JSON
+      of the method, path, status and durations. The logger writes to its
+      own log file, so the records don't end up in the errors of
+      ``api.log``.
+    - If a trace file is given, a sample of the requests is appended to it
+      as JSON Lines spans, with the offset and duration of each phase.
+    """
+
+    def __init__(self, app, trace_file=TRACE_FILE,
+                 sample_rate=TRACE_SAMPLE_RATE, log_file=TIMING_LOG_FILE,
+                 log_level=TIMING_LOG_LEVEL):
+        """Create a new instance of the ``RequestTiming``.
+
+        :param app: The flask application.
+        :param trace_file: The path of the file of the sampled spans, or
+         ``None`` to not export spans.
+        :param sample_rate: The ratio of the requests exported, between 0
+         and 1.
+        :param log_file: The path of the file of the logged records, or
+         ``None`` to leave the ``coffee_shop.timing`` logger to the logging
+         configuration of the application.
+        :param log_level: The level of the logger when logging to
+         ``log_file``, e.g. ``WARNING`` to not log the records.
+        """
+        self.trace_file = trace_file
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+
+        if log_file:
+            handler = logging.FileHandler(log_file)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(log_level)
+            # Keep the records out of the handlers of the root logger
+            logger.propagate = False
+
+        app.before_request(self.start)
+        app.after_request(self.report)
+
+    def start(self):
+        g.timing_start = time.perf_counter()
+        g.timings = []
+
+    def report(self, response):
+        if "timings" not in g:
+            return response
+
+        total = time.perf_counter() - g.timing_start
+        durations = {}
+        for name, _, duration in g.timings:
+            durations[name] = durations.get(name, 0) + duration
+        durations["total"] = total
+
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={duration * 1000:.2f}"
+            for name, duration in durations.items()
+        )
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "durations_ms": {
+                        name: round(duration * 1000, 3)
+                        for name, duration in durations.items()
+                    },
+                }
+            )
+        )
+
+        if self.trace_file and random.random() < self.sample_rate:
+            self.export(response, total)
+        return response
+
+    def export(self, response, total):
+        """Append the spans of the current request to the trace file.
+
+        :param response: The response object.
+        :param total: The duration of the request in seconds.
+        """
+        span = {
+            "trace_id": uuid.uuid4().hex,
+            "timestamp": time.time() - total,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 3),
+            "spans": [
+                {
+                    "name": name,
+                    "offset_ms": round(offset * 1000, 3),
+                    "duration_ms": round(duration * 1000, 3),
+                }
+                for name, offset, duration in g.timings
+            ],
+        }
+        line = json.dumps(span, separators=(",", ":")) + "\n"
+        with self.lock, open(self.trace_file, "a") as trace_file:
+            trace_file.write(line)
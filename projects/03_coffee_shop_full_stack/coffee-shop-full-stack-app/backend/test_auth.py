@@ -0,0 +1,318 @@
+"""
+    test_auth.py
+    ------------
+
+    This module contains the tests of the caches and the permission checks
+    of the ``src.auth`` package, run against a stand-in ``file://`` JWKS
+    signed by keys generated for the tests.
+"""
+
+__author__ = "Filipe Bezerra de Sousa"
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import rsa
+from flask import Flask
+from jose import jwt
+
+from src.auth import auth
+from src.auth.auth import AuthError, requires_auth
+from src.auth.jwks import JWKSKeyStore, UNKNOWN_KID_INTERVAL, parse_max_age
+from src.auth.permissions import Permissions
+from src.auth.token_cache import TokenCache
+
+KEY_SIZE = 1024
+
+public_key = None
+private_key = None
+
+
+def setUpModule():
+    """Generate the RSA key pair of the tests once."""
+    global public_key, private_key
+    public_key, private_key = rsa.newkeys(KEY_SIZE)
+
+
+def to_base64url(number):
+    """Encode an integer the way a JWK does.
+
+    :param number: The int, e.g. the modulus of an RSA key.
+    :return: The base64url str without padding.
+    """
+    data = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def write_jwks(path, *kids):
+    """Write a JWKS file holding the public key of the tests once per kid.
+
+    :param path: The ``Path`` of the JWKS file.
+    :param kids: The kid strs of the keys.
+    """
+    path.write_text(
+        json.dumps(
+            {
+                "keys": [
+                    {
+                        "kty": "RSA",
+                        "use": "sig",
+                        "kid": kid,
+                        "n": to_base64url(public_key.n),
+                        "e": to_base64url(public_key.e),
+                    }
+                    for kid in kids
+                ]
+            }
+        )
+    )
+
+
+def mint_token(permissions=(), expires_in=3600, kid="k1"):
+    """Sign a token the way Auth0 does with the private key of the tests.
+
+    :param permissions: The permission strs of the token.
+    :param expires_in: The number of seconds until the token expires.
+    :param kid: The kid of the header.
+    :return: The JWT token str.
+    """
+    return jwt.encode(
+        {
+            "iss": f"https://{auth.AUTH0_DOMAIN}/",
+            "aud": auth.API_AUDIENCE,
+            "exp": int(time.time()) + expires_in,
+            "permissions": list(permissions),
+        },
+        private_key.save_pkcs1().decode("ascii"),
+        algorithm=auth.ALGORITHMS[0],
+        headers={"kid": kid},
+    )
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    """This class represents the test case of the JWKS key store"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="coffee-jwks-")
+        self.path = Path(self.directory, "jwks.json")
+        write_jwks(self.path, "k1")
+        self.key_store = JWKSKeyStore(self.path.as_uri())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_key(self):
+        """Test the keys are fetched on first use and cached"""
+        self.assertIsNotNone(self.key_store.get_key("k1"))
+        fetched_at = self.key_store.fetched_at
+
+        os.remove(self.path)
+        self.assertIsNotNone(self.key_store.get_key("k1"))
+        self.assertEqual(self.key_store.fetched_at, fetched_at)
+
+    def test_refetch_on_unknown_kid(self):
+        """Test a kid rotated in is picked up right after the first fetch"""
+        self.assertIsNotNone(self.key_store.get_key("k1"))
+
+        write_jwks(self.path, "k1", "k2")
+        self.assertIsNotNone(self.key_store.get_key("k2"))
+
+    def test_unknown_kid_interval(self):
+        """
+        Test an unknown kid refetches the keys at most once per interval,
+        and only the refetches of unknown kid start the interval
+        """
+        self.assertIsNone(self.key_store.get_key("k2"))
+
+        write_jwks(self.path, "k1", "k2")
+        self.assertIsNone(self.key_store.get_key("k2"))
+
+        # A scheduled refresh doesn't delay the next unknown kid refetch
+        self.key_store.unknown_kid_fetched_at -= UNKNOWN_KID_INTERVAL
+        self.key_store.refresh()
+        write_jwks(self.path, "k1", "k2", "k3")
+        self.assertIsNotNone(self.key_store.get_key("k3"))
+
+    def test_parse_max_age(self):
+        """Test the lifetime of the keys is read from Cache-Control"""
+        self.assertEqual(parse_max_age("public, max-age=3600"), 3600)
+        self.assertEqual(parse_max_age("Max-Age=60, must-revalidate"), 60)
+        self.assertEqual(parse_max_age("no-cache"), 0)
+        self.assertEqual(parse_max_age("no-store, max-age=3600"), 0)
+        self.assertIsNone(parse_max_age("public"))
+        self.assertIsNone(parse_max_age(None))
+
+    def test_keys_expire(self):
+        """Test the keys are fetched again once expired"""
+        self.assertIsNotNone(self.key_store.get_key("k1"))
+
+        write_jwks(self.path, "k2")
+        self.key_store.expires_at = time.monotonic()
+        self.assertIsNone(self.key_store.get_key("k1"))
+        self.assertIsNotNone(self.key_store.get_key("k2"))
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """This class represents the test case of the token cache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="coffee-jwks-")
+        path = Path(self.directory, "jwks.json")
+        write_jwks(path, "k1")
+
+        self.key_store, auth.key_store = (
+            auth.key_store,
+            JWKSKeyStore(path.as_uri()),
+        )
+        self.token_cache, auth.token_cache = auth.token_cache, TokenCache()
+        self.app = Flask(__name__)
+
+        @requires_auth("get:drinks-detail")
+        def get_payload(payload):
+            return payload
+
+        self.get_payload = get_payload
+
+    def tearDown(self):
+        auth.key_store = self.key_store
+        auth.token_cache = self.token_cache
+        shutil.rmtree(self.directory)
+
+    def request(self, token):
+        """Run the view requiring auth with a bearer token.
+
+        :param token: The JWT token.
+        :return: The payload given to the view.
+        """
+        with self.app.test_request_context(
+            headers={"Authorization": f"Bearer {token}"}
+        ):
+            return self.get_payload()
+
+    def test_lru_eviction(self):
+        """Test the least recently used token is evicted once full"""
+        cache = TokenCache(max_size=2)
+        payload = {"exp": time.time() + 60}
+        cache.put("a", payload)
+        cache.put("b", payload)
+        self.assertIs(cache.get("a"), payload)
+
+        cache.put("c", payload)
+        self.assertEqual(len(cache.entries), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(cache.get("a"), payload)
+        self.assertIs(cache.get("c"), payload)
+
+    def test_expired_entry_is_dropped(self):
+        """Test a token is forgotten once its exp claim has passed"""
+        cache = TokenCache()
+        cache.put("fresh", {"exp": time.time() + 60})
+        cache.put("expired", {"exp": time.time() - 1})
+        cache.put("no-exp", {})
+
+        self.assertIsNotNone(cache.get("fresh"))
+        self.assertIsNone(cache.get("expired"))
+        self.assertNotIn(TokenCache.key("expired"), cache.entries)
+        self.assertIsNone(cache.get("no-exp"))
+
+    def test_verified_token_is_cached(self):
+        """Test a token sent again skips the verification"""
+        token = mint_token(["get:drinks-detail"])
+        payload = self.request(token)
+        self.assertIs(auth.token_cache.get(token), payload)
+
+        # The key set can't be fetched anymore, so only a hit succeeds
+        auth.key_store = JWKSKeyStore(Path(self.directory).as_uri() + "/x")
+        self.assertIs(self.request(token), payload)
+
+    def test_tampered_token_never_hits(self):
+        """Test a token with altered claims is verified and rejected"""
+        token = mint_token(["get:drinks-detail"])
+        self.request(token)
+
+        header, claims, signature = token.split(".")
+        claims = json.loads(base64.urlsafe_b64decode(claims + "=="))
+        claims["permissions"].append("delete:drinks")
+        claims = base64.urlsafe_b64encode(
+            json.dumps(claims).encode("utf-8")
+        ).rstrip(b"=").decode("ascii")
+        tampered = ".".join((header, claims, signature))
+
+        for _ in range(2):
+            with self.assertRaises(AuthError) as context:
+                self.request(tampered)
+            self.assertEqual(context.exception.status_code, 401)
+        self.assertIsNone(auth.token_cache.get(tampered))
+        self.assertEqual(len(auth.token_cache.entries), 1)
+
+
+class PermissionsTestCase(unittest.TestCase):
+    """This class represents the test case of the compiled permissions"""
+
+    def test_exact_permission(self):
+        """Test an exact permission allows only itself"""
+        permissions = Permissions(["post:drinks"])
+        self.assertTrue(permissions.allows("post:drinks"))
+        self.assertFalse(permissions.allows("patch:drinks"))
+        self.assertFalse(permissions.allows("post:drinks-detail"))
+        self.assertEqual(permissions.trie, {})
+
+    def test_single_segment_wildcard(self):
+        """Test a * segment allows any single segment"""
+        permissions = Permissions(["*:drinks"])
+        self.assertTrue(permissions.allows("post:drinks"))
+        self.assertTrue(permissions.allows("delete:drinks"))
+        self.assertFalse(permissions.allows("get:drinks-detail"))
+        self.assertFalse(permissions.allows("post:drinks:bulk"))
+        self.assertFalse(permissions.allows("drinks"))
+
+    def test_trailing_wildcard(self):
+        """Test a trailing * allows any remaining segments"""
+        permissions = Permissions(["post:*"])
+        self.assertTrue(permissions.allows("post:drinks"))
+        self.assertTrue(permissions.allows("post:drinks:bulk"))
+        self.assertFalse(permissions.allows("patch:drinks"))
+        self.assertFalse(permissions.allows("post"))
+
+        self.assertTrue(Permissions(["*"]).allows("delete:drinks"))
+
+    def test_resource_scoped_wildcard(self):
+        """Test a resource followed by * allows every verb on it"""
+        permissions = Permissions(["drinks:*"])
+        self.assertTrue(permissions.allows("get:drinks"))
+        self.assertTrue(permissions.allows("patch:drinks"))
+        self.assertFalse(permissions.allows("get:drinks-detail"))
+        self.assertFalse(permissions.allows("drinks:post"))
+
+    def test_rejections(self):
+        """Test nothing is allowed without a matching permission"""
+        self.assertFalse(Permissions().allows("get:drinks"))
+        permissions = Permissions(["get:*:detail", "patch:drinks", 42])
+        self.assertTrue(permissions.allows("get:drinks:detail"))
+        self.assertFalse(permissions.allows("get:drinks"))
+        self.assertFalse(permissions.allows("get:drinks:detail:x"))
+        self.assertFalse(permissions.allows("get:drinks-detail"))
+
+    def test_check_permissions(self):
+        """Test the permission checks of a payload"""
+        self.assertTrue(
+            auth.check_permissions(
+                "delete:drinks", {"permissions": ["drinks:*"]}
+            )
+        )
+        with self.assertRaises(AuthError) as context:
+            auth.check_permissions(
+                "delete:drinks", {"permissions": ["delete:drinks-detail"]}
+            )
+        self.assertEqual(context.exception.status_code, 403)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()